@@ -0,0 +1,176 @@
+import argparse
+import asyncio
+import functools
+import logging
+import random
+import resource
+import statistics
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from benchmarks.environment import prepare_environment, ADMIN_ID, GROUP_ID
+from benchmarks.fake_bot_api import FakeBotAPI
+
+# every command here is answered with exactly one outgoing call, which is how replies are matched to updates
+WORKLOAD = [("/h", 3), ("/sessions", 3), ("/chat_id", 3), ("docker is up again", 1)]
+IGNORED_METHODS = {"getMe", "deleteWebhook", "setMyCommands", "sendChatAction", "getUpdates"}
+
+
+def percentile(samples: list[float], q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))] if samples else 0
+
+
+def describe(name: str, samples: list[float]) -> str:
+    if not samples:
+        return f"{name:<28} no samples"
+    return f"{name:<28} n={len(samples):<6} mean={statistics.mean(samples) * 1000:8.3f}ms " \
+           f"p50={percentile(samples, 0.5) * 1000:8.3f}ms p95={percentile(samples, 0.95) * 1000:8.3f}ms " \
+           f"p99={percentile(samples, 0.99) * 1000:8.3f}ms"
+
+
+def time_middleware(cls, samples: dict[str, list[float]]) -> None:
+    # own time only: whatever the wrapped handler chain spends is taken out again
+    original = cls.__call__
+
+    @functools.wraps(original)
+    async def __call__(self, handler, event, data):
+        inner = 0.0
+
+        async def timed_handler(event, data):
+            nonlocal inner
+            start = time.perf_counter()
+            try:
+                return await handler(event, data)
+            finally:
+                inner += time.perf_counter() - start
+
+        start = time.perf_counter()
+        try:
+            return await original(self, timed_handler, event, data)
+        finally:
+            samples[cls.__name__].append(time.perf_counter() - start - inner)
+
+    cls.__call__ = __call__
+
+
+def rss_mib() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def run(args) -> None:
+    from aiogram import Bot
+    from aiogram.client.default import DefaultBotProperties
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from lib.bot import create_dispatcher
+    from lib.database import flush_database
+    from lib.middlewares.access_middleware import AccessMiddleware
+    from lib.middlewares.logger_middleware import LoggerMiddleware
+    from lib.middlewares.request_metrics_middleware import RequestMetricsMiddleware
+    from lib.middlewares.user_middleware import UserMiddleware
+    from lib.webhook_replay import text_update
+
+    middleware_samples: dict[str, list[float]] = defaultdict(list)
+    for cls in (LoggerMiddleware, AccessMiddleware, UserMiddleware):
+        time_middleware(cls, middleware_samples)
+
+    pending: dict[int, deque[float]] = defaultdict(deque)
+    latencies: list[float] = []
+    done = asyncio.Event()
+
+    def on_call(method: str, chat_id: int | None, now: float) -> None:
+        if method in IGNORED_METHODS or not pending.get(chat_id):
+            return
+        latencies.append(now - pending[chat_id].popleft())
+        if len(latencies) >= args.updates:
+            done.set()
+
+    api = FakeBotAPI(on_call)
+    url = await api.start()
+    bot = Bot(
+        token="123456:benchmark",
+        default=DefaultBotProperties(parse_mode=None, disable_notification=True),
+        session=AiohttpSession(api=TelegramAPIServer.from_base(url))
+    )
+    bot.session.middleware(RequestMetricsMiddleware())
+    dp = create_dispatcher()
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, close_bot_session=False))
+
+    async def flush_periodically():
+        while True:
+            await asyncio.sleep(5)
+            await flush_database()
+
+    flusher = asyncio.create_task(flush_periodically())
+
+    texts, weights = zip(*WORKLOAD)
+    admins = [ADMIN_ID + index for index in range(args.admins)]
+    # tracemalloc slows every allocation down, so it only runs when asked for
+    if args.trace_memory:
+        tracemalloc.start()
+    rss_before = rss_mib()
+    start = time.perf_counter()
+
+    for index in range(args.updates):
+        user_id = random.choice(admins)
+        pending[user_id].append(time.perf_counter())
+        api.push(text_update(0, user_id, user_id, random.choices(texts, weights)[0]))
+        if args.rate:
+            await asyncio.sleep(max(0.0, start + (index + 1) / args.rate - time.perf_counter()))
+        elif index % 100 == 0:
+            await asyncio.sleep(0)
+
+    try:
+        await asyncio.wait_for(done.wait(), args.timeout)
+    except asyncio.TimeoutError:
+        print(f"timed out with {len(latencies)}/{args.updates} replies")
+    elapsed = time.perf_counter() - start
+    snapshot = tracemalloc.take_snapshot() if args.trace_memory else None
+    tracemalloc.stop()
+
+    await dp.stop_polling()
+    await polling
+    flusher.cancel()
+    await bot.session.close()
+    await api.close()
+
+    sent = sum(count for method, count in api.calls.items() if method not in IGNORED_METHODS)
+    print(f"{args.updates} updates from {args.admins} admins in {elapsed:.2f}s "
+          f"({args.updates / elapsed:.0f} updates/s)")
+    print(f"outgoing calls: {sent} ({sent / elapsed:.0f}/s) "
+          + ", ".join(f"{method}={count}" for method, count in api.calls.most_common()))
+    print(describe("end to end", latencies))
+    for name, samples in middleware_samples.items():
+        print(describe(name, samples))
+    print(f"max rss {rss_before:.0f} -> {rss_mib():.0f}MiB")
+    if snapshot:
+        print(f"python heap allocated during the run and still alive: "
+              f"{sum(stat.size for stat in snapshot.statistics('filename')) / 2 ** 20:.1f}MiB")
+        for stat in snapshot.statistics('lineno')[:args.top]:
+            print(f"  {stat}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the dispatcher with simulated admins through a fake Bot API")
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--admins", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=0, help="updates per second, 0 sends them all at once")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--trace-memory", action="store_true", help="show what is still allocated after the run")
+    parser.add_argument("--top", type=int, default=10, help="largest allocation sites to show")
+    args = parser.parse_args()
+
+    servers = prepare_environment(
+        1, admin_ids=[ADMIN_ID + index for index in range(args.admins)], group_ids=[GROUP_ID]
+    )
+    logging.disable(logging.INFO)
+    try:
+        asyncio.run(run(args))
+    finally:
+        for server in servers:
+            server.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from benchmarks.fake_ssh_server import FakeSSHServer, load_host_key
+
+KEY_NAME = "bench_ed25519"
+ADMIN_ID = 1000
+GROUP_ID = -1000
+
+
+def write_key(path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(Ed25519PrivateKey.generate().private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.OpenSSH, serialization.NoEncryption()
+    ))
+
+
+def prepare_environment(hosts: int, latency: float = 0, **settings) -> list[FakeSSHServer]:
+    # lib reads its settings on import, so this has to run before anything from lib is imported
+    root = Path(tempfile.mkdtemp(prefix="ssh-bot-bench-"))
+    secret_folder, data_folder = root / "secret", root / "data"
+    data_folder.mkdir(parents=True)
+    write_key(secret_folder / ".ssh_keys" / KEY_NAME)
+
+    host_key = load_host_key(secret_folder / ".ssh_keys" / KEY_NAME)
+    servers = [FakeSSHServer(host_key, latency).start() for _ in range(hosts)]
+    (secret_folder / "settings.json").write_text(json.dumps({
+        "hosts": [{
+            "name": f"bench{index}", "hostname": "127.0.0.1", "port": str(server.port), "username": "bench",
+            "key_name": KEY_NAME, "docker_projects_path": "/srv", "executor_workers": 8, "executor_queue_size": 64
+        } for index, server in enumerate(servers)],
+        "main_host": "bench0",
+        "bot_project_name": "bot",
+        "main_group_id": GROUP_ID,
+        "group_ids": [GROUP_ID],
+        "admin_ids": [ADMIN_ID],
+        "bot_token": "123456:benchmark",
+        "otp_secret": "JBSWY3DPEHPK3PXP",
+        "docker_updates": {},
+        **settings
+    }))
+
+    os.environ["SECRET_FOLDER_PATH"] = str(secret_folder)
+    os.environ["DATA_FOLDER_PATH"] = str(data_folder)
+    return servers
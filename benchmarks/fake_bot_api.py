@@ -0,0 +1,100 @@
+import asyncio
+import json
+import time
+from collections import Counter
+from typing import Callable
+from aiohttp import web
+
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+MESSAGE_METHODS = {
+    "sendMessage", "sendPhoto", "sendDocument", "editMessageText", "editMessageCaption", "editMessageMedia",
+    "editMessageReplyMarkup",
+}
+
+
+class FakeBotAPI:
+    # enough of the Bot API for the dispatcher to poll updates and for handlers to answer them
+    def __init__(self, on_call: Callable[[str, int | None, float], None] | None = None):
+        self.on_call = on_call
+        self.calls: Counter[str] = Counter()
+        self.first_call: float | None = None
+        self.last_call: float | None = None
+        self._updates: list[dict] = []
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self._new_updates = asyncio.Event()
+        self._runner: web.AppRunner | None = None
+        self.url = ''
+
+    def push(self, update: dict) -> int:
+        update["update_id"] = self._next_update_id
+        self._next_update_id += 1
+        self._updates.append(update)
+        self._new_updates.set()
+        return update["update_id"]
+
+    def message(self, fields: dict) -> dict:
+        chat_id = int(fields.get("chat_id", 0))
+        message_id = int(fields.get("message_id") or 0) or self._next_message_id
+        self._next_message_id += 1
+        result = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+            "from": BOT_USER,
+        }
+        if "text" in fields:
+            result["text"] = fields["text"]
+        if "caption" in fields:
+            result["caption"] = fields["caption"]
+        return result
+
+    async def get_updates(self, fields: dict) -> list[dict]:
+        offset = int(fields.get("offset", 0))
+        limit = int(fields.get("limit", 100))
+        self._updates = [update for update in self._updates if update["update_id"] >= offset]
+        if not self._updates:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), float(fields.get("timeout", 0)))
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:limit]
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        fields = dict(await request.post())
+
+        if method == "getUpdates":
+            result = await self.get_updates(fields)
+        else:
+            now = time.perf_counter()
+            self.calls[method] += 1
+            self.first_call = self.first_call or now
+            self.last_call = now
+            chat_id = int(fields["chat_id"]) if "chat_id" in fields else None
+            if self.on_call:
+                self.on_call(method, chat_id, now)
+
+            if method == "getMe":
+                result = BOT_USER
+            elif method in MESSAGE_METHODS:
+                result = self.message(fields)
+            else:
+                result = True
+        return web.json_response({"ok": True, "result": result}, dumps=json.dumps)
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        app = web.Application(client_max_size=32 * 1024 * 1024)
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.url = f"http://{host}:{self._runner.addresses[0][1]}"
+        return self.url
+
+    async def close(self) -> None:
+        self._new_updates.set()
+        if self._runner:
+            await self._runner.cleanup()
@@ -0,0 +1,208 @@
+import json
+import socket
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+import paramiko
+
+PROMPT = b"bench@fake:~$ "
+BANNER = b"Welcome to the benchmark host\r\nLast login: never\r\n"
+
+PROC_OUTPUT = """cpu  {user} 0 {system} {idle} 0 0 0 0 0 0
+cpu0 {user} 0 {system} {idle} 0 0 0 0 0 0
+MemTotal:        8000000 kB
+MemFree:         2000000 kB
+MemAvailable:    4000000 kB
+SwapTotal:       1000000 kB
+SwapFree:         900000 kB
+0.42 0.36 0.30 1/200 4242
+123456.78 234567.89
+"""
+
+SCRIPTED_OUTPUT = {
+    "uptime": " 12:00:00 up 1 day,  2:03,  1 user,  load average: 0.42, 0.36, 0.30\n",
+    "free": "               total        used        free      shared  buff/cache   available\n"
+            "Mem:         7812500     3906250     1953125       10000     1953125     3906250\n"
+            "Swap:         976562       97656      878906\n",
+    "top -bn1": "top - 12:00:00 up 1 day,  2:03,  1 user,  load average: 0.42, 0.36, 0.30\n"
+                "Tasks: 200 total,   1 running, 199 sleeping,   0 stopped,   0 zombie\n"
+                "%Cpu(s):  5.0 us,  2.0 sy,  0.0 ni, 93.0 id,  0.0 wa,  0.0 hi,  0.0 si,  0.0 st\n",
+    "true": "",
+}
+
+
+def container(index: int) -> dict:
+    return {
+        "Id": f"{index:064x}",
+        "Names": [f"/bench-{index}"],
+        "Image": f"bench/app-{index}",
+        "ImageID": f"sha256:{index:064x}",
+        "State": "running",
+        "Status": "Up 2 hours",
+        "Labels": {"com.docker.compose.project": f"project{index % 3}"},
+    }
+
+
+def container_stats(tick: int) -> dict:
+    return {
+        "cpu_stats": {"cpu_usage": {"total_usage": 1000 + tick * 50}, "system_cpu_usage": 100000 + tick * 1000,
+                      "online_cpus": 4},
+        "precpu_stats": {"cpu_usage": {"total_usage": 1000 + (tick - 1) * 50},
+                         "system_cpu_usage": 100000 + (tick - 1) * 1000 if tick else 0},
+        "memory_stats": {"usage": 200_000_000, "limit": 8_000_000_000, "stats": {"inactive_file": 50_000_000}},
+    }
+
+
+class FakeSSHHost(paramiko.ServerInterface):
+    # answers the commands the bot sends with canned output, every reply delayed by the simulated latency
+    def __init__(self, server: 'FakeSSHServer'):
+        self.server = server
+
+    def check_auth_publickey(self, username, key):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def get_allowed_auths(self, username):
+        return 'publickey'
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED if kind == 'session' else paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_window_change_request(self, channel, width, height, pixelwidth, pixelheight):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        self.server.spawn(self.server.shell, channel)
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        self.server.spawn(self.server.exec, channel, command.decode())
+        return True
+
+
+class FakeSSHServer:
+    def __init__(self, host_key: paramiko.PKey, latency: float = 0, containers: int = 5):
+        self.host_key = host_key
+        self.latency = latency
+        self.containers = [container(index) for index in range(containers)]
+        self.commands = 0
+        self._socket = socket.socket()
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(('127.0.0.1', 0))
+        self._socket.listen(64)
+        self.port = self._socket.getsockname()[1]
+        self._transports: list[paramiko.Transport] = []
+        self._closed = False
+
+    def start(self) -> 'FakeSSHServer':
+        self.spawn(self._accept)
+        return self
+
+    @staticmethod
+    def spawn(target, *args) -> None:
+        threading.Thread(target=target, args=args, daemon=True).start()
+
+    def _accept(self) -> None:
+        while not self._closed:
+            try:
+                client, _ = self._socket.accept()
+            except OSError:
+                return
+            # like sshd, the fake host never holds back small writes, delays left in the numbers are client side
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            transport = paramiko.Transport(client)
+            transport.add_server_key(self.host_key)
+            transport.start_server(server=FakeSSHHost(self))
+            self._transports.append(transport)
+
+    def _reply(self, channel: paramiko.Channel, data: bytes, exit_status: int | None = 0) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        if data:
+            channel.sendall(data)
+        if exit_status is not None:
+            channel.send_exit_status(exit_status)
+            channel.close()
+
+    def exec(self, channel: paramiko.Channel, command: str) -> None:
+        self.commands += 1
+        # the exec request is acknowledged after this handler returns, replies sent earlier can get lost
+        time.sleep(0.001)
+        try:
+            if command == "docker system dial-stdio":
+                return self.docker(channel)
+            if command.startswith("cat /proc/stat"):
+                tick = int(time.monotonic() * 100)
+                return self._reply(channel, PROC_OUTPUT.format(user=tick, system=tick // 2, idle=tick * 10).encode())
+            if command in SCRIPTED_OUTPUT:
+                return self._reply(channel, SCRIPTED_OUTPUT[command].encode())
+            if command.startswith("docker ps"):
+                lines = ["CONTAINER ID   IMAGE   STATUS   NAMES"] + [
+                    f"{c['Id'][:12]}   {c['Image']}   {c['Status']}   {c['Names'][0][1:]}" for c in self.containers
+                ]
+                return self._reply(channel, ("\n".join(lines) + "\n").encode())
+            return self._reply(channel, f"{command}\n".encode())
+        except (OSError, EOFError):
+            channel.close()
+
+    def docker(self, channel: paramiko.Channel) -> None:
+        file = channel.makefile('rb')
+        request_line = file.readline().decode()
+        while file.readline().strip():
+            pass
+        url = urlsplit(request_line.split()[1])
+        query = parse_qs(url.query)
+
+        if url.path.endswith("/stats") and query.get("stream") == ["1"]:
+            self._reply(channel, b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                                 b"Transfer-Encoding: chunked\r\n\r\n", None)
+            tick = 0
+            while not channel.closed:
+                body = json.dumps(container_stats(tick)).encode() + b"\n"
+                channel.sendall(f"{len(body):x}\r\n".encode() + body + b"\r\n")
+                tick += 1
+                time.sleep(0.2)
+            return
+
+        if url.path == "/containers/json":
+            body = self.containers
+        elif url.path == "/images/json":
+            body = [{"Id": c["ImageID"], "RepoDigests": [f"{c['Image']}@sha256:{'0' * 64}"]} for c in self.containers]
+        elif url.path.endswith("/stats"):
+            body = container_stats(1)
+        else:
+            body = {"message": f"no such path {url.path}"}
+        payload = json.dumps(body).encode()
+        self._reply(channel, b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n" +
+                    f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload)
+
+    def shell(self, channel: paramiko.Channel) -> None:
+        # echoes like a pty in cooked mode and prints a new prompt on every enter
+        try:
+            channel.sendall(BANNER)
+            time.sleep(0.01)
+            channel.sendall(PROMPT)
+            while data := channel.recv(1024):
+                if self.latency:
+                    time.sleep(self.latency)
+                if data in (b'\x04', b'exit\r'):
+                    break
+                channel.sendall(data.replace(b'\r', b'\r\n' + PROMPT))
+            channel.send_exit_status(0)
+        except (OSError, EOFError):
+            pass
+        finally:
+            channel.close()
+
+    def close(self) -> None:
+        self._closed = True
+        self._socket.close()
+        for transport in self._transports:
+            transport.close()
+
+
+def load_host_key(path: Path) -> paramiko.PKey:
+    return paramiko.Ed25519Key.from_private_key_file(path)
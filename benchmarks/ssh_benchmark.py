@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from benchmarks.environment import prepare_environment
+
+
+def summarize(name: str, samples: list[float]) -> str:
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+    return f"{name:<32} n={len(samples):<5} mean={statistics.mean(samples) * 1000:8.2f}ms " \
+           f"p50={statistics.median(samples) * 1000:8.2f}ms p95={p95 * 1000:8.2f}ms"
+
+
+def measure(func, iterations: int) -> list[float]:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_connect(ssh, iterations: int) -> list[float]:
+    def connect():
+        ssh.disconnect()
+        ssh.connect()
+
+    return measure(connect, iterations)
+
+
+def bench_commands(ssh, iterations: int) -> list[str]:
+    ssh.connect()
+    return [
+        summarize("exec true", measure(lambda: ssh.run_single_command("true"), iterations)),
+        summarize("exec uptime", measure(lambda: ssh.run_single_command("uptime"), iterations)),
+        summarize("host metrics (/proc)", measure(ssh.get_host_metrics, iterations)),
+        summarize("docker api containers", measure(ssh.get_running_containers, iterations)),
+        summarize("docker api images", measure(ssh.docker.images, iterations)),
+        summarize("stats (streams warm)", measure(ssh.get_stats, iterations)),
+    ]
+
+
+async def bench_fan_out(ssh_manager, host_counts: list[int], iterations: int) -> list[str]:
+    lines = []
+    hosts = ssh_manager.get_hosts()
+    for count in host_counts:
+        selected = [ssh_manager[host] for host in hosts[:count]]
+        for ssh in selected:
+            await ssh.executor.run(ssh.get_stats)
+
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            await asyncio.gather(*(ssh.executor.run(ssh.get_stats) for ssh in selected))
+            samples.append(time.perf_counter() - start)
+        lines.append(summarize(f"get_stats on {count} hosts", samples))
+    return lines
+
+
+def bench_interactive(host, iterations: int) -> list[str]:
+    from lib.ssh_interactive_session import SSHInteractiveSession
+
+    open_samples, echo_samples = [], []
+    for _ in range(max(1, iterations // 10)):
+        session = SSHInteractiveSession(host)
+        start = time.perf_counter()
+        session.open()
+        open_samples.append(time.perf_counter() - start)
+
+        # the bot's reader polls once a second, the raw channel shows what the shell itself costs
+        for index in range(10):
+            marker = f"m{index}"
+            start = time.perf_counter()
+            session.send_command(marker)
+            received = b''
+            while marker.encode() not in received:
+                received += session.channel.recv(1024)
+            echo_samples.append(time.perf_counter() - start)
+            session.send_command("\r")
+        session.close()
+
+    return [summarize("interactive open (to prompt)", open_samples), summarize("interactive echo", echo_samples)]
+
+
+async def run(args) -> None:
+    from lib.config_reader import config
+    from lib.ssh_manager import ssh_manager
+
+    ssh = ssh_manager[config.hosts[0].name.get_secret_value()]
+    lines = [summarize("connect (tcp + kex + auth)", bench_connect(ssh, args.iterations))]
+    lines += bench_commands(ssh, args.iterations)
+    lines += await bench_fan_out(ssh_manager, args.hosts, args.iterations)
+    lines += bench_interactive(config.hosts[0], args.iterations)
+    print("\n".join(lines))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SSH commands and sessions against local fake hosts")
+    parser.add_argument("--hosts", type=lambda value: [int(n) for n in value.split(',')], default=[1, 2, 4, 8],
+                        help="comma separated host counts for the fan-out benchmark")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=0, help="delay added to every reply of the fake hosts")
+    args = parser.parse_args()
+
+    servers = prepare_environment(max(args.hosts), args.latency_ms / 1000)
+    # every command is logged at info level, which would drown the results
+    logging.disable(logging.INFO)
+    try:
+        asyncio.run(run(args))
+    finally:
+        for server in servers:
+            server.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,178 @@
 import asyncio
+import hashlib
+import re
+import time
+from dataclasses import dataclass
+from typing import Iterable
 import aiohttp
+from multidict import CIMultiDictProxy
+from lib.api.http_session import create_client_session
+from lib.logger import main_logger
 
+DOCKER_HUB_REGISTRY = "registry-1.docker.io"
+REGISTRY_CONCURRENCY = 8
+REGISTRY_MAX_RETRIES = 5
+REGISTRY_TIMEOUT = aiohttp.ClientTimeout(total=30)
+MANIFEST_ACCEPT = ", ".join([
+    "application/vnd.oci.image.index.v1+json",
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.docker.distribution.manifest.v2+json",
+    "application/vnd.oci.image.manifest.v1+json",
+])
 
-async def get_latest_image_digest(image_repository: str) -> str | None:
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"https://hub.docker.com/v2/repositories/{image_repository}/tags/latest") as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    return data.get("digest", None)
-    except aiohttp.ClientError:
-        pass
-    return None
+
+class RegistryError(Exception):
+    def __init__(self, status: int, url: str):
+        self.status = status
+        super().__init__(f"Registry error {status} for {url}.")
+
+
+@dataclass(frozen=True)
+class ImageReference:
+    registry: str
+    repository: str
+    tag: str
+
+    @classmethod
+    def parse(cls, image: str) -> 'ImageReference':
+        name, tag = image, "latest"
+        if ':' in image.rsplit('/', 1)[-1]:
+            name, tag = image.rsplit(':', 1)
+
+        first, _, rest = name.partition('/')
+        if rest and ('.' in first or ':' in first or first == "localhost"):
+            registry, repository = first, rest
+        else:
+            registry, repository = DOCKER_HUB_REGISTRY, name
+
+        if registry in ("docker.io", "index.docker.io"):
+            registry = DOCKER_HUB_REGISTRY
+        if registry == DOCKER_HUB_REGISTRY and '/' not in repository:
+            repository = f"library/{repository}"
+        return cls(registry, repository, tag)
+
+    @property
+    def manifest_url(self) -> str:
+        return f"https://{self.registry}/v2/{self.repository}/manifests/{self.tag}"
+
+
+class RegistryClient:
+    def __init__(self, concurrency: int = REGISTRY_CONCURRENCY, max_retries: int = REGISTRY_MAX_RETRIES):
+        self.max_retries = max_retries
+        self._session: aiohttp.ClientSession | None = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tokens: dict[tuple[str, str], tuple[str, float]] = {}
+        self._etags: dict[ImageReference, tuple[str, str]] = {}
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = create_client_session(timeout=REGISTRY_TIMEOUT)
+        return self._session
+
+    async def get_latest_digest(self, image: str) -> str | None:
+        reference = ImageReference.parse(image)
+        async with self._semaphore:
+            try:
+                return await self._get_digest(reference)
+            except (aiohttp.ClientError, asyncio.TimeoutError, RegistryError) as e:
+                main_logger.warning(f"Digest check for {image} failed: {e}")
+        return None
+
+    async def get_latest_digests(self, images: Iterable[str]) -> dict[str, str | None]:
+        images = list(images)
+        digests = await asyncio.gather(*(self.get_latest_digest(image) for image in images))
+        return dict(zip(images, digests))
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+    async def _get_digest(self, reference: ImageReference) -> str:
+        headers = {"Accept": MANIFEST_ACCEPT}
+        cached = self._etags.get(reference)
+        if cached:
+            headers["If-None-Match"] = cached[0]
+
+        status, response_headers, _ = await self._request("HEAD", reference, headers)
+        if status == 304 and cached:
+            return cached[1]
+        if status != 200:
+            raise RegistryError(status, reference.manifest_url)
+
+        digest = response_headers.get("Docker-Content-Digest")
+        if digest is None:
+            # not every registry sends the digest on HEAD, the manifest hash is the digest
+            status, response_headers, body = await self._request("GET", reference, {"Accept": MANIFEST_ACCEPT})
+            if status != 200:
+                raise RegistryError(status, reference.manifest_url)
+            digest = response_headers.get("Docker-Content-Digest") or f"sha256:{hashlib.sha256(body).hexdigest()}"
+
+        if etag := response_headers.get("ETag"):
+            self._etags[reference] = (etag, digest)
+        return digest
+
+    async def _request(self, method: str, reference: ImageReference,
+                       headers: dict[str, str]) -> tuple[int, CIMultiDictProxy[str], bytes]:
+        delay = 1
+        authenticated = False
+        attempt = 0
+        while True:
+            request_headers = dict(headers)
+            if token := self._get_token(reference):
+                request_headers["Authorization"] = f"Bearer {token}"
+
+            async with self.session.request(method, reference.manifest_url, headers=request_headers) as response:
+                body = await response.read() if method == "GET" else b''
+                status, response_headers = response.status, response.headers
+
+            if status == 401 and not authenticated:
+                authenticated = True
+                await self._authenticate(reference, response_headers.get("WWW-Authenticate", ""))
+                continue
+
+            if status == 429 and attempt < self.max_retries:
+                attempt += 1
+                retry_after = response_headers.get("Retry-After", "")
+                await asyncio.sleep(float(retry_after) if retry_after.isdigit() else delay)
+                delay *= 2
+                continue
+
+            return status, response_headers, body
+
+    def _get_token(self, reference: ImageReference) -> str | None:
+        token, expires_at = self._tokens.get((reference.registry, reference.repository), (None, 0))
+        if token and time.monotonic() < expires_at:
+            return token
+        return None
+
+    async def _authenticate(self, reference: ImageReference, challenge: str) -> None:
+        if not challenge.lower().startswith("bearer"):
+            raise RegistryError(401, reference.manifest_url)
+
+        params = dict(re.findall(r'(\w+)="([^"]*)"', challenge))
+        realm = params.pop("realm", None)
+        if realm is None:
+            raise RegistryError(401, reference.manifest_url)
+        params.setdefault("scope", f"repository:{reference.repository}:pull")
+
+        async with self.session.get(realm, params=params) as response:
+            if response.status != 200:
+                raise RegistryError(response.status, realm)
+            data = await response.json(content_type=None)
+
+        token = data.get("token") or data.get("access_token")
+        expires_in = int(data.get("expires_in", 60))
+        self._tokens[(reference.registry, reference.repository)] = (token, time.monotonic() + expires_in - 10)
+
+
+registry_client = RegistryClient()
+
+
+async def main():
+    print(await registry_client.get_latest_digests(["siegfriedschmidt/telegram-ssh-bot", "ghcr.io/astral-sh/uv"]))
+    await registry_client.close()
 
 
 if __name__ == '__main__':
-    print(asyncio.run(get_latest_image_digest("siegfriedschmidt/telegram-ssh-bot")))
+    asyncio.run(main())
@@ -0,0 +1,281 @@
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterator
+from urllib.parse import urlencode, quote
+import paramiko
+from lib.logger import ssh_logger
+from lib.tracing import tracer
+
+# proxies stdin/stdout of an ssh channel to the remote /var/run/docker.sock
+DOCKER_DIAL_COMMAND = "docker system dial-stdio"
+DOCKER_API_TIMEOUT = 30
+# sshd's default MaxSessions, a couple of channels stay free for the commands running meanwhile
+SSH_SESSION_CHANNELS = 10
+RESERVED_CHANNELS = 2
+
+
+class DockerEngineError(Exception):
+    def __init__(self, status: int, message: str):
+        self.status = status
+        super().__init__(f"Docker Engine API error {status}: {message}")
+
+
+@dataclass
+class ContainerStats:
+    name: str
+    cpu_percent: float
+    mem_usage: float
+    mem_limit: float
+
+
+def compose_project_name(project_name: str) -> str:
+    # docker compose derives the project label from the directory name this way
+    return re.sub(r'[^a-z0-9_-]', '', project_name.lower())
+
+
+def calculate_cpu_percent(stats: dict) -> float:
+    cpu_stats = stats.get("cpu_stats", {})
+    precpu_stats = stats.get("precpu_stats", {})
+    cpu_delta = cpu_stats.get("cpu_usage", {}).get("total_usage", 0) - \
+        precpu_stats.get("cpu_usage", {}).get("total_usage", 0)
+    system_delta = cpu_stats.get("system_cpu_usage", 0) - precpu_stats.get("system_cpu_usage", 0)
+    online_cpus = cpu_stats.get("online_cpus") or len(cpu_stats.get("cpu_usage", {}).get("percpu_usage") or []) or 1
+
+    if cpu_delta > 0 and system_delta > 0:
+        return 100 * online_cpus * cpu_delta / system_delta
+    return 0
+
+
+def calculate_memory_usage(stats: dict) -> float:
+    memory_stats = stats.get("memory_stats", {})
+    usage = memory_stats.get("usage", 0)
+    # same as the docker cli: page cache is not counted (cgroup v1 / v2 keys)
+    cache = memory_stats.get("stats", {}).get("total_inactive_file", memory_stats.get("stats", {}).get("inactive_file", 0))
+    return usage - cache if cache < usage else usage
+
+
+class DockerEngineResponse:
+    def __init__(self, channel: paramiko.Channel):
+        self.channel = channel
+        self.file = channel.makefile('rb')
+
+        status_line = self.file.readline().decode().strip()
+        if not status_line:
+            raise DockerEngineError(0, channel.recv_stderr(4096).decode().strip() or "empty response")
+        self.status = int(status_line.split()[1])
+
+        self.headers: dict[str, str] = {}
+        while line := self.file.readline().decode().strip():
+            key, value = line.split(':', 1)
+            self.headers[key.strip().lower()] = value.strip()
+
+    def chunks(self) -> Iterator[bytes]:
+        if self.headers.get('transfer-encoding') == 'chunked':
+            while size_line := self.file.readline():
+                size = int(size_line.split(b';')[0], 16)
+                if size == 0:
+                    break
+                yield self.file.read(size)
+                self.file.readline()
+        elif 'content-length' in self.headers:
+            yield self.file.read(int(self.headers['content-length']))
+        else:
+            yield self.file.read()
+
+    def read(self) -> bytes:
+        return b''.join(self.chunks())
+
+    def json(self):
+        body = self.read()
+        if self.status >= 400:
+            try:
+                message = json.loads(body).get("message", body.decode())
+            except ValueError:
+                message = body.decode()
+            raise DockerEngineError(self.status, message)
+        return json.loads(body) if body else None
+
+    def json_stream(self) -> Iterator[dict]:
+        if self.status >= 400:
+            self.json()
+
+        buffer = b''
+        for chunk in self.chunks():
+            buffer += chunk
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+
+    def close(self):
+        self.file.close()
+        self.channel.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class DockerEngineClient:
+    def __init__(self, get_client: Callable[[], paramiko.SSHClient], name: str = ''):
+        self.get_client = get_client
+        self.name = name
+
+    def request(self, method: str, path: str, query: dict | None = None, body: dict | None = None,
+                timeout: float | None = DOCKER_API_TIMEOUT) -> DockerEngineResponse:
+        channel = self.get_client().get_transport().open_session(timeout=DOCKER_API_TIMEOUT)
+        channel.settimeout(timeout)
+        channel.exec_command(DOCKER_DIAL_COMMAND)
+
+        if query:
+            path += '?' + urlencode({k: json.dumps(v) if isinstance(v, dict) else v for k, v in query.items()})
+        payload = json.dumps(body).encode() if body is not None else b''
+        channel.sendall(
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: docker\r\n"
+            f"Connection: close\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+        )
+
+        try:
+            return DockerEngineResponse(channel)
+        except Exception:
+            channel.close()
+            raise
+
+    def get(self, path: str, query: dict | None = None):
+        with tracer.span('docker.api', host=self.name, path=path), self.request("GET", path, query) as response:
+            return response.json()
+
+    def containers(self, all_containers: bool = False, filters: dict | None = None) -> list[dict]:
+        query = {"all": int(all_containers)}
+        if filters:
+            query["filters"] = filters
+        return self.get("/containers/json", query)
+
+    def project_containers(self, project_name: str) -> list[dict]:
+        label = f"com.docker.compose.project={compose_project_name(project_name)}"
+        return self.containers(True, {"label": [label]})
+
+    def images(self) -> list[dict]:
+        return self.get("/images/json")
+
+    def inspect_container(self, container_id: str) -> dict:
+        return self.get(f"/containers/{quote(container_id)}/json")
+
+    def container_stats(self, container_id: str) -> dict:
+        return self.get(f"/containers/{quote(container_id)}/stats", {"stream": 0})
+
+    def stream_container_stats(self, container_id: str) -> DockerEngineResponse:
+        return self.request("GET", f"/containers/{quote(container_id)}/stats", {"stream": 1}, timeout=None)
+
+
+class _StatsStream(threading.Thread):
+    def __init__(self, client: DockerEngineClient, container_id: str, name: str):
+        super().__init__(daemon=True, name=f"docker-stats-{name}")
+        self.client = client
+        self.container_id = container_id
+        self.container_name = name
+        self.latest: ContainerStats | None = None
+        self.updated = threading.Event()
+        self.finished = False
+        self._response: DockerEngineResponse | None = None
+
+    def run(self):
+        try:
+            self._response = self.client.stream_container_stats(self.container_id)
+            for stats in self._response.json_stream():
+                if self.finished:
+                    break
+                # the first sample has no previous cpu counters to compare with
+                if not stats.get("precpu_stats", {}).get("system_cpu_usage"):
+                    continue
+                self.latest = ContainerStats(
+                    name=self.container_name,
+                    cpu_percent=calculate_cpu_percent(stats),
+                    mem_usage=calculate_memory_usage(stats),
+                    mem_limit=stats.get("memory_stats", {}).get("limit", 0)
+                )
+                self.updated.set()
+        except Exception as e:
+            if not self.finished:
+                ssh_logger.warning(f"Stats stream for {self.container_name} on {self.client.name} failed: {e}")
+        finally:
+            self.finished = True
+            self.updated.set()
+            if self._response:
+                self._response.close()
+
+    def stop(self):
+        self.finished = True
+        if self._response:
+            self._response.close()
+
+
+class DockerStatsStreamer:
+    # every stream holds its own ssh session channel, and sshd allows 10 per connection by default
+    def __init__(self, client: DockerEngineClient, max_streams: int = 6, idle_timeout: float = 600):
+        self.client = client
+        self.max_streams = max_streams
+        self.idle_timeout = idle_timeout
+        self._streams: dict[str, _StatsStream] = {}
+        self._lock = threading.Lock()
+        self._last_used = 0.0
+
+    @tracer.span('docker.stats')
+    def get_stats(self, containers: list[dict], wait: float = 3) -> dict[str, ContainerStats]:
+        self._last_used = time.monotonic()
+        running = {c["Id"]: c["Names"][0].lstrip('/') for c in containers if c.get("State") == "running"}
+
+        with self._lock:
+            for container_id in list(self._streams):
+                if container_id not in running or self._streams[container_id].finished:
+                    self._streams.pop(container_id).stop()
+
+            for container_id, name in running.items():
+                if container_id not in self._streams and len(self._streams) < self.max_streams:
+                    stream = _StatsStream(self.client, container_id, name)
+                    self._streams[container_id] = stream
+                    stream.start()
+
+            streams = dict(self._streams)
+
+        # containers without a stream need a snapshot each, and the daemon spends a second sampling every one
+        snapshots = {}
+        if rest := [container_id for container_id in running if container_id not in streams]:
+            workers = max(1, min(len(rest), SSH_SESSION_CHANNELS - RESERVED_CHANNELS - len(streams)))
+            with ThreadPoolExecutor(workers, thread_name_prefix=f"stats-{self.client.name}") as pool:
+                snapshots = dict(zip(rest, pool.map(self.client.container_stats, rest)))
+
+        deadline = time.monotonic() + wait
+        result = {}
+        for container_id, name in running.items():
+            if container_id in streams:
+                stream = streams[container_id]
+                stream.updated.wait(max(0.0, deadline - time.monotonic()))
+                if stream.latest:
+                    result[name] = stream.latest
+            else:
+                stats = snapshots[container_id]
+                result[name] = ContainerStats(
+                    name, calculate_cpu_percent(stats), calculate_memory_usage(stats),
+                    stats.get("memory_stats", {}).get("limit", 0)
+                )
+        return result
+
+    def stop_idle(self) -> None:
+        if time.monotonic() - self._last_used > self.idle_timeout:
+            self.stop()
+
+    def stop(self) -> None:
+        with self._lock:
+            for stream in self._streams.values():
+                stream.stop()
+            self._streams.clear()
@@ -1,10 +1,24 @@
 import asyncio
-import aiohttp
 import ipaddress
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable
+import aiohttp
+from lib.api.http_session import create_client_session
+from lib.api.mmdb_reader import MMDBReader, MMDBError
+from lib.init import geoip_folder_path
+from lib.logger import main_logger
 
 # https://ip-api.com/docs/api:json
+# https://ip-api.com/docs/api:batch
 
 geoip_url = "http://ip-api.com/json"
+geoip_batch_url = "http://ip-api.com/batch"
+GEOIP_BATCH_SIZE = 100
+GEOIP_CACHE_SIZE = 1024
+GEOIP_CACHE_TTL = 6 * 60 * 60
+GEOIP_TIMEOUT = aiohttp.ClientTimeout(total=15)
 
 
 class GeoIPError(Exception):
@@ -23,28 +37,202 @@ class GeoIPAPIError(GeoIPError):
         super().__init__(f"GeoIP API error: {status}.")
 
 
-async def geoip(ip: str) -> dict:
+def validate_ip(ip: str) -> None:
     try:
         ipaddress.ip_address(ip)
     except ValueError:
         raise GeoIPWrongIPError(ip)
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(f'{geoip_url}/{ip}') as rs:
+
+def mmdb_to_ip_api(record: dict, info: dict) -> None:
+    # GeoLite2 / GeoIP2 City, Country and ASN records in ip-api's response fields
+    def name(item: dict) -> str | None:
+        return item.get("names", {}).get("en")
+
+    if country := record.get("country"):
+        info["country"] = name(country)
+        info["countryCode"] = country.get("iso_code")
+    if subdivisions := record.get("subdivisions"):
+        info["region"] = subdivisions[0].get("iso_code")
+        info["regionName"] = name(subdivisions[0])
+    if city := record.get("city"):
+        info["city"] = name(city)
+    if postal := record.get("postal"):
+        info["zip"] = postal.get("code")
+    if location := record.get("location"):
+        info["lat"] = location.get("latitude")
+        info["lon"] = location.get("longitude")
+        info["timezone"] = location.get("time_zone")
+    if "autonomous_system_number" in record:
+        organization = record.get("autonomous_system_organization", "")
+        info["isp"] = info["org"] = organization
+        info["as"] = f"AS{record['autonomous_system_number']} {organization}".strip()
+
+
+class LocalGeoIP:
+    def __init__(self, folder: Path):
+        self.folder = folder
+        self._readers: list[MMDBReader] | None = None
+
+    @property
+    def readers(self) -> list[MMDBReader]:
+        # databases are opened on the first lookup, every *.mmdb file in the folder contributes its fields
+        if self._readers is None:
+            self._readers = []
+            for filename in sorted(self.folder.glob("*.mmdb")) if self.folder.exists() else []:
+                try:
+                    self._readers.append(MMDBReader(filename))
+                    main_logger.info(f"GeoIP database {filename.name} loaded")
+                except (OSError, MMDBError, KeyError) as e:
+                    main_logger.warning(f"Could not load GeoIP database {filename.name}: {e}")
+        return self._readers
+
+    def lookup(self, ip: str) -> dict | None:
+        info = {}
+        for reader in self.readers:
+            try:
+                record = reader.get(ip)
+            except MMDBError:
+                continue
+            if isinstance(record, dict):
+                mmdb_to_ip_api(record, info)
+
+        if not info:
+            return None
+        return {"status": "success", **{k: v for k, v in info.items() if v is not None}, "query": ip}
+
+    def close(self) -> None:
+        for reader in self._readers or []:
+            reader.close()
+        self._readers = None
+
+
+class GeoIPClient:
+    def __init__(self, cache_size: int = GEOIP_CACHE_SIZE, cache_ttl: float = GEOIP_CACHE_TTL,
+                 local: LocalGeoIP | None = None):
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.local = local
+        self._session: aiohttp.ClientSession | None = None
+        self._cache: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._in_flight: dict[str, asyncio.Future] = dict()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = create_client_session(limit=10, timeout=GEOIP_TIMEOUT)
+        return self._session
+
+    def _get_cached(self, ip: str) -> dict | None:
+        cached = self._cache.get(ip)
+        if cached is None:
+            return None
+        if cached[0] < time.monotonic():
+            del self._cache[ip]
+            return None
+        self._cache.move_to_end(ip)
+        return cached[1]
+
+    def _set_cached(self, ip: str, info: dict) -> None:
+        self._cache[ip] = (time.monotonic() + self.cache_ttl, info)
+        self._cache.move_to_end(ip)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def lookup(self, ip: str) -> dict:
+        result = (await self.lookup_many([ip]))[ip]
+        if isinstance(result, GeoIPError):
+            raise result
+        return result
+
+    async def lookup_many(self, ips: Iterable[str]) -> dict[str, dict | GeoIPError]:
+        results: dict[str, dict | GeoIPError] = dict()
+        waiting: dict[str, asyncio.Future] = dict()
+        missing: list[str] = []
+
+        for ip in dict.fromkeys(ips):
+            try:
+                validate_ip(ip)
+            except GeoIPWrongIPError as e:
+                results[ip] = e
+                continue
+
+            if (cached := self._get_cached(ip)) is not None:
+                results[ip] = cached
+            elif self.local and (local := self.local.lookup(ip)) is not None:
+                results[ip] = local
+            elif ip in self._in_flight:
+                waiting[ip] = self._in_flight[ip]
+            else:
+                missing.append(ip)
+
+        if missing:
+            results.update(await self._fetch_missing(missing))
+
+        for ip, future in waiting.items():
+            results[ip] = await asyncio.shield(future)
+        return results
+
+    async def _fetch_missing(self, ips: list[str]) -> dict[str, dict | GeoIPError]:
+        loop = asyncio.get_running_loop()
+        futures = {ip: loop.create_future() for ip in ips}
+        self._in_flight.update(futures)
+
+        fetched: dict[str, dict | GeoIPError] = dict()
+        try:
+            for i in range(0, len(ips), GEOIP_BATCH_SIZE):
+                chunk = ips[i:i + GEOIP_BATCH_SIZE]
+                try:
+                    fetched.update(await self._request(chunk))
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    fetched.update({ip: GeoIPAPIError(str(e) or type(e).__name__) for ip in chunk})
+                except GeoIPAPIError as e:
+                    fetched.update({ip: e for ip in chunk})
+            return fetched
+        finally:
+            # concurrent callers waiting for these ips get the same answer, errors included
+            for ip, future in futures.items():
+                self._in_flight.pop(ip, None)
+                result = fetched.get(ip, GeoIPAPIError("no result"))
+                if isinstance(result, dict):
+                    self._set_cached(ip, result)
+                future.set_result(result)
+
+    async def _request(self, ips: list[str]) -> dict[str, dict | GeoIPError]:
+        if len(ips) == 1:
+            request = self.session.get(f'{geoip_url}/{ips[0]}')
+        else:
+            request = self.session.post(geoip_batch_url, json=ips)
+
+        async with request as rs:
             if rs.status != 200:
                 raise GeoIPAPIError(rs.status)
-
             json = await rs.json()
 
-            if json['status'] == "fail":
-                raise GeoIPAPIError(json['message'])
+        results = dict()
+        for ip, info in zip(ips, json if isinstance(json, list) else [json]):
+            results[ip] = GeoIPAPIError(info['message']) if info['status'] == "fail" else info
+        return results
 
-            return json
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+        if self.local:
+            self.local.close()
+
+
+geoip_client = GeoIPClient(local=LocalGeoIP(geoip_folder_path))
+
+
+async def geoip(ip: str) -> dict:
+    return await geoip_client.lookup(ip)
 
 
 async def main():
     info = await geoip("45.141.215.17")
     print(info)
+    print(await geoip_client.lookup_many(["45.141.215.17", "8.8.8.8", "1.1.1.1", "wrong"]))
+    await geoip_client.close()
 
 
 if __name__ == '__main__':
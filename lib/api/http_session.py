@@ -0,0 +1,11 @@
+import aiohttp
+from aiohttp_socks import ProxyConnector
+from lib.config_reader import config
+
+
+def create_client_session(limit: int = 100, **kwargs) -> aiohttp.ClientSession:
+    if config.proxy_url:
+        connector = ProxyConnector.from_url(config.proxy_url, limit=limit)
+    else:
+        connector = aiohttp.TCPConnector(limit=limit)
+    return aiohttp.ClientSession(connector=connector, **kwargs)
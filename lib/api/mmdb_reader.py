@@ -0,0 +1,185 @@
+import ipaddress
+import mmap
+import struct
+import threading
+from pathlib import Path
+
+# https://maxmind.github.io/MaxMind-DB/
+
+METADATA_MARKER = b"\xab\xcd\xefMaxMind.com"
+METADATA_MAX_SIZE = 128 * 1024
+DATA_SECTION_SEPARATOR = 16
+RECORD_CACHE_SIZE = 4096
+
+
+class MMDBError(Exception):
+    pass
+
+
+class MMDBDecoder:
+    def __init__(self, buffer: mmap.mmap | bytes, pointer_base: int):
+        self.buffer = buffer
+        self.pointer_base = pointer_base
+
+    def decode(self, offset: int) -> tuple[object, int]:
+        ctrl = self.buffer[offset]
+        offset += 1
+        type_ = ctrl >> 5
+
+        if type_ == 1:
+            pointer, offset = self._pointer(ctrl, offset)
+            value, _ = self.decode(pointer)
+            return value, offset
+
+        if type_ == 0:
+            type_ = 7 + self.buffer[offset]
+            offset += 1
+
+        size, offset = self._size(ctrl, offset)
+        return self._decode_value(type_, size, offset)
+
+    def _pointer(self, ctrl: int, offset: int) -> tuple[int, int]:
+        size = (ctrl >> 3) & 0x3
+        value = ctrl & 0x7
+        if size == 0:
+            pointer = (value << 8) | self.buffer[offset]
+        elif size == 1:
+            pointer = ((value << 16) | int.from_bytes(self.buffer[offset:offset + 2], 'big')) + 2048
+        elif size == 2:
+            pointer = ((value << 24) | int.from_bytes(self.buffer[offset:offset + 3], 'big')) + 526336
+        else:
+            pointer = int.from_bytes(self.buffer[offset:offset + 4], 'big')
+        return self.pointer_base + pointer, offset + size + 1
+
+    def _size(self, ctrl: int, offset: int) -> tuple[int, int]:
+        size = ctrl & 0x1f
+        if size < 29:
+            return size, offset
+        extra = size - 28
+        value = int.from_bytes(self.buffer[offset:offset + extra], 'big')
+        return (29, 285, 65821)[extra - 1] + value, offset + extra
+
+    def _decode_value(self, type_: int, size: int, offset: int) -> tuple[object, int]:
+        end = offset + size
+        if type_ == 2:
+            return self.buffer[offset:end].decode('utf-8'), end
+        if type_ == 3:
+            return struct.unpack('>d', self.buffer[offset:offset + 8])[0], offset + 8
+        if type_ == 4:
+            return bytes(self.buffer[offset:end]), end
+        if type_ in (5, 6, 9, 10):
+            return int.from_bytes(self.buffer[offset:end], 'big'), end
+        if type_ == 8:
+            return int.from_bytes(self.buffer[offset:end], 'big', signed=size == 4), end
+        if type_ == 7:
+            result = {}
+            for _ in range(size):
+                key, offset = self.decode(offset)
+                result[key], offset = self.decode(offset)
+            return result, offset
+        if type_ == 11:
+            result = []
+            for _ in range(size):
+                value, offset = self.decode(offset)
+                result.append(value)
+            return result, offset
+        if type_ == 14:
+            return bool(size), offset
+        if type_ == 15:
+            return struct.unpack('>f', self.buffer[offset:offset + 4])[0], offset + 4
+        raise MMDBError(f"Unsupported data type {type_} at offset {offset}")
+
+
+class MMDBReader:
+    def __init__(self, filename: Path):
+        self.filename = filename
+        self._file = open(filename, 'rb')
+        self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        marker = self._buffer.rfind(METADATA_MARKER, max(0, len(self._buffer) - METADATA_MAX_SIZE))
+        if marker == -1:
+            raise MMDBError(f"{filename} is not a MaxMind DB file")
+        metadata_start = marker + len(METADATA_MARKER)
+        self.metadata, _ = MMDBDecoder(self._buffer, metadata_start).decode(metadata_start)
+
+        self.node_count: int = self.metadata["node_count"]
+        self.record_size: int = self.metadata["record_size"]
+        self.ip_version: int = self.metadata["ip_version"]
+        self.database_type: str = self.metadata.get("database_type", "")
+        if self.record_size not in (24, 28, 32):
+            raise MMDBError(f"Unsupported record size {self.record_size}")
+
+        self._node_bytes = self.record_size // 4
+        self._tree_size = self._node_bytes * self.node_count
+        self._decoder = MMDBDecoder(self._buffer, self._tree_size + DATA_SECTION_SEPARATOR)
+        self._ipv4_start: int | None = None
+        self._records: dict[int, object] = dict()
+        self._lock = threading.Lock()
+
+    def _read_node(self, node: int, bit: int) -> int:
+        offset = node * self._node_bytes
+        buffer = self._buffer
+        if self.record_size == 24:
+            offset += bit * 3
+            return int.from_bytes(buffer[offset:offset + 3], 'big')
+        if self.record_size == 28:
+            middle = buffer[offset + 3]
+            if bit:
+                return ((middle & 0x0f) << 24) | int.from_bytes(buffer[offset + 4:offset + 7], 'big')
+            return ((middle & 0xf0) << 20) | int.from_bytes(buffer[offset:offset + 3], 'big')
+        offset += bit * 4
+        return int.from_bytes(buffer[offset:offset + 4], 'big')
+
+    def _ipv4_start_node(self) -> int:
+        # ipv4 addresses live under ::/96 of an ipv6 tree, found once and reused for every lookup
+        if self._ipv4_start is None:
+            node = 0
+            if self.ip_version == 6:
+                for _ in range(96):
+                    if node >= self.node_count:
+                        break
+                    node = self._read_node(node, 0)
+            self._ipv4_start = node
+        return self._ipv4_start
+
+    def get_with_prefix(self, ip: str) -> tuple[object | None, int]:
+        address = ipaddress.ip_address(ip)
+        if address.version == 6 and self.ip_version == 4:
+            raise MMDBError(f"{ip} is an IPv6 address, {self.filename.name} only has IPv4 data")
+
+        packed = address.packed
+        bit_count = len(packed) * 8
+        node = self._ipv4_start_node() if address.version == 4 else 0
+        number = int.from_bytes(packed, 'big')
+
+        depth = 0
+        while depth < bit_count and node < self.node_count:
+            node = self._read_node(node, (number >> (bit_count - 1 - depth)) & 1)
+            depth += 1
+
+        if node == self.node_count:
+            return None, depth
+        if node < self.node_count:
+            raise MMDBError(f"Invalid search tree node for {ip}")
+        return self._resolve(node), depth
+
+    def get(self, ip: str) -> object | None:
+        return self.get_with_prefix(ip)[0]
+
+    def _resolve(self, node: int) -> object:
+        # records point past the node count, the distance is the offset into the data section plus the separator
+        offset = self._tree_size + node - self.node_count
+        with self._lock:
+            if offset in self._records:
+                return self._records[offset]
+
+        record, _ = self._decoder.decode(offset)
+        with self._lock:
+            if len(self._records) >= RECORD_CACHE_SIZE:
+                self._records.pop(next(iter(self._records)))
+            self._records[offset] = record
+        return record
+
+    def close(self) -> None:
+        self._buffer.close()
+        self._file.close()
@@ -0,0 +1,177 @@
+import asyncio
+import struct
+from lib.logger import main_logger
+
+# https://developer.valvesoftware.com/wiki/Source_RCON_Protocol
+
+SERVERDATA_AUTH = 3
+SERVERDATA_AUTH_RESPONSE = 2
+SERVERDATA_EXECCOMMAND = 2
+SERVERDATA_RESPONSE_VALUE = 0
+
+RCON_TIMEOUT = 10
+# servers split longer responses into several packets with the same request id
+RCON_FRAGMENT_SIZE = 4096
+RCON_FRAGMENT_WAIT = 0.2
+# request ids are signed 32 bit on the wire and -1 marks a failed authentication
+RCON_MAX_REQUEST_ID = 2 ** 31 - 1
+
+
+class RconError(Exception):
+    pass
+
+
+class RconAuthError(RconError):
+    def __init__(self, address: str):
+        super().__init__(f"RCON authentication failed for {address}.")
+
+
+def encode_packet(request_id: int, packet_type: int, body: str) -> bytes:
+    payload = struct.pack('<ii', request_id, packet_type) + body.encode('utf-8') + b'\x00\x00'
+    return struct.pack('<i', len(payload)) + payload
+
+
+class _PendingResponse:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.future: asyncio.Future[str] = loop.create_future()
+        self.fragments: list[bytes] = []
+        self.complete_handle: asyncio.TimerHandle | None = None
+
+    def add(self, body: bytes) -> bool:
+        self.fragments.append(body)
+        if self.complete_handle:
+            self.complete_handle.cancel()
+            self.complete_handle = None
+        return len(body) < RCON_FRAGMENT_SIZE
+
+    def finish(self) -> None:
+        if not self.future.done():
+            self.future.set_result(b''.join(self.fragments).decode('utf-8', errors='replace'))
+
+
+class RconClient:
+    def __init__(self, address: str, port: int, password: str, timeout: float = RCON_TIMEOUT):
+        self.address = address
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._read_task: asyncio.Task | None = None
+        self._pending: dict[int, _PendingResponse] = dict()
+        self._connect_lock = asyncio.Lock()
+        self._request_id = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    def _next_request_id(self) -> int:
+        self._request_id = self._request_id % RCON_MAX_REQUEST_ID + 1
+        return self._request_id
+
+    @staticmethod
+    async def _read_packet(reader: asyncio.StreamReader) -> tuple[int, int, bytes]:
+        size, = struct.unpack('<i', await reader.readexactly(4))
+        payload = await reader.readexactly(size)
+        request_id, packet_type = struct.unpack('<ii', payload[:8])
+        return request_id, packet_type, payload[8:-2]
+
+    async def connect(self) -> None:
+        async with self._connect_lock:
+            if self.connected:
+                return
+
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.address, self.port), self.timeout
+            )
+            try:
+                request_id = self._next_request_id()
+                self._writer.write(encode_packet(request_id, SERVERDATA_AUTH, self.password))
+                await self._writer.drain()
+
+                # source servers send an empty response value before the auth response
+                while True:
+                    response_id, packet_type, _ = await asyncio.wait_for(self._read_packet(self._reader), self.timeout)
+                    if packet_type == SERVERDATA_AUTH_RESPONSE:
+                        break
+                if response_id == -1 or response_id != request_id:
+                    raise RconAuthError(f"{self.address}:{self.port}")
+            except BaseException:
+                self._close_connection()
+                raise
+
+            self._read_task = asyncio.create_task(self._read_loop(self._reader, self._writer))
+            main_logger.info(f"RCON connection to {self.address}:{self.port} established!")
+
+    async def _read_loop(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                request_id, packet_type, body = await self._read_packet(reader)
+                pending = self._pending.get(request_id)
+                if pending is None:
+                    continue
+                if pending.add(body):
+                    pending.finish()
+                else:
+                    pending.complete_handle = loop.call_later(RCON_FRAGMENT_WAIT, pending.finish)
+        except (asyncio.IncompleteReadError, ConnectionError, OSError) as e:
+            main_logger.warning(f"RCON connection to {self.address}:{self.port} lost: {e}")
+        finally:
+            # a reconnect may already have replaced this connection
+            if writer is self._writer:
+                self._close_connection()
+            else:
+                writer.close()
+
+    def _close_connection(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+        for pending in self._pending.values():
+            if not pending.future.done():
+                pending.future.set_exception(RconError(f"RCON connection to {self.address}:{self.port} closed."))
+        self._pending.clear()
+
+    async def commands(self, commands: list[str]) -> list[str]:
+        if not self.connected:
+            await self.connect()
+        # the read loop drops a lost connection at once, possibly before anything was written
+        writer = self._writer
+        if writer is None or writer.is_closing():
+            raise RconError(f"RCON connection to {self.address}:{self.port} closed.")
+
+        # every command goes out at once, responses are matched back by request id
+        loop = asyncio.get_running_loop()
+        request_ids = []
+        futures = []
+        for command in commands:
+            request_id = self._next_request_id()
+            self._pending[request_id] = _PendingResponse(loop)
+            request_ids.append(request_id)
+            futures.append(self._pending[request_id].future)
+            writer.write(encode_packet(request_id, SERVERDATA_EXECCOMMAND, command))
+
+        try:
+            await writer.drain()
+            return list(await asyncio.wait_for(asyncio.gather(*futures), self.timeout * len(commands)))
+        except ConnectionError as e:
+            await self.close()
+            raise RconError(f"RCON connection to {self.address}:{self.port} lost: {e}") from e
+        except asyncio.TimeoutError:
+            # a server that stopped answering is not worth keeping
+            await self.close()
+            raise RconError(f"RCON server {self.address}:{self.port} did not respond in time.")
+        finally:
+            for request_id in request_ids:
+                self._pending.pop(request_id, None)
+
+    async def command(self, command: str) -> str:
+        return (await self.commands([command]))[0]
+
+    async def close(self) -> None:
+        if self._read_task is not None:
+            self._read_task.cancel()
+            self._read_task = None
+        self._close_connection()
@@ -1,19 +1,39 @@
 import asyncio
+import html
+from datetime import datetime
+from aiohttp import web
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
-from lib.api.docker_api import get_latest_image_digest
+from lib.api.docker_api import registry_client
+from lib.api.geoip_api import geoip_client
+from lib.api.docker_engine_api import compose_project_name
 from lib.bot_commands import set_bot_commands
 from lib.config_reader import config
+from lib.database import database, flush_database, prune_database
+from lib.fsm_storage import SQLiteStorage
 from lib.init import bot_version
 from lib.routers import public_commands, errors, admin_commands, ssh_session
 from lib.logger import main_logger
+from lib.metrics import instrumented_job, start_metrics_server
+from lib.metrics_collector import collect_metrics, save_metrics_history
 from lib.middlewares.access_middleware import AccessMiddleware
 from lib.middlewares.logger_middleware import LoggerMiddleware
+from lib.middlewares.metrics_middleware import MetricsMiddleware
+from lib.middlewares.tracing_middleware import TracingMiddleware
+from lib.middlewares.request_metrics_middleware import RequestMetricsMiddleware
+from lib.models import DockerUpdateModel
+from lib.settings_watcher import settings_watcher
 from lib.ssh_manager import ssh_manager
 from lib.storage import storage
+from lib.update_orchestrator import update_orchestrator
+from lib.utils.general_utils import run_in_thread
+
+
+rollout_tasks: set[asyncio.Task] = set()
 
 
 async def notification(message: str, bot: Bot, parse_mode=None):
@@ -28,7 +48,8 @@ async def on_startup(bot: Bot) -> None:
 
     # startup docker checks
     if storage.startup_docker_checks:
-        containers_json = ssh_manager[config.main_host.get_secret_value()].get_running_containers()
+        ssh = ssh_manager[config.main_host.get_secret_value()]
+        containers_json = await ssh.executor.run(ssh.get_running_containers)
         nextcloud_running = False
         for c in containers_json:
             if c["Image"] == 'nextcloud':
@@ -36,67 +57,184 @@ async def on_startup(bot: Bot) -> None:
         start_message += '' if nextcloud_running else " Nextcloud is NOT running. Launch it via '/up nextcloud'."
 
     await notification(start_message, bot, parse_mode="HTML")
+    ssh_manager.warm_shell_pools()
 
 
 async def on_shutdown(bot: Bot) -> None:
+    await save_metrics_history()
+    await registry_client.close()
+    await geoip_client.close()
+    await ssh_manager.close_rcon_clients()
+    await ssh_manager.sessions.close()
+    await ssh_manager.close_shell_pools()
     await notification("Bot stopped.", bot)
+    await storage.flush()
+    await run_in_thread(database.close)
+
+
+async def skip_running_digests(detected: dict[str, list[DockerUpdateModel]], latest_digests: dict[str, str]):
+    hosts = list({u.host for updates in detected.values() for u in updates})
+    results = await asyncio.gather(
+        *(ssh_manager[host].executor.run(ssh_manager[host].get_running_digests) for host in hosts),
+        return_exceptions=True
+    )
+
+    running_digests = {}
+    for host, result in zip(hosts, results):
+        if isinstance(result, Exception):
+            main_logger.warning(f"Could not read running image digests on {host}: {result}")
+        else:
+            running_digests[host] = result
+
+    for repository, docker_update_list in detected.items():
+        latest_sha = latest_digests[repository]
+        for docker_update in list(docker_update_list):
+            project_digests = running_digests.get(docker_update.host, {})
+            if latest_sha in project_digests.get(compose_project_name(docker_update.project_name), set()):
+                main_logger.info(f"{docker_update} already runs {repository}@{latest_sha}, skipping update")
+                database.add_update_event(
+                    docker_update.host, docker_update.project_name, repository, latest_sha, "skipped",
+                    detail="already running"
+                )
+                docker_update_list.remove(docker_update)
 
 
 async def docker_image_update_check(bot: Bot):
     docker_updates_hashes = storage.docker_updates_hashes
-    whole_updating_message_list = []
-    for repository, docker_update_list in config.docker_updates.items():
-        updating_message_list = []
+    latest_digests = await registry_client.get_latest_digests(config.docker_updates.keys())
 
-        if (latest_sha := await get_latest_image_digest(repository)) is None:
+    detected: dict[str, list[DockerUpdateModel]] = {}
+    for repository, docker_update_list in config.docker_updates.items():
+        if (latest_sha := latest_digests[repository]) is None:
             continue
 
         for docker_update in docker_update_list:
             docker_update_str = docker_update.to_str()
             if latest_sha != docker_updates_hashes.get(docker_update_str, ""):
                 docker_updates_hashes[docker_update_str] = latest_sha
-                updating_message_list.append(
-                    f"      Host: <b>{docker_update.host}</b>, Project: <b>{docker_update.project_name}</b>"
-                )
-                ssh_manager[docker_update.host].update(docker_update.project_name)
+                detected.setdefault(repository, []).append(docker_update)
+
+    if not detected:
+        return
+
+    await skip_running_digests(detected, latest_digests)
+    storage.docker_updates_hashes = docker_updates_hashes
+    if not any(detected.values()):
+        return
+
+    # a rollout can take half an hour per target, the job returns and lets it run on its own
+    task = asyncio.create_task(roll_out(bot, detected, latest_digests))
+    rollout_tasks.add(task)
+    task.add_done_callback(on_rollout_done)
 
-        if updating_message_list:
-            whole_updating_message_list.append(
-                f"Image <b>{repository}</b> update detected ({latest_sha[-7:]})\n"
-                f"Updating to latest:\n" + "\n".join(updating_message_list)
+
+def on_rollout_done(task: asyncio.Task) -> None:
+    rollout_tasks.discard(task)
+    if not task.cancelled() and (e := task.exception()) is not None:
+        main_logger.error("Docker image rollout failed", exc_info=e)
+
+
+async def roll_out(bot: Bot, detected: dict[str, list[DockerUpdateModel]], latest_digests: dict[str, str]):
+    # updating the bot's own project restarts this process, so it is started after the summary
+    def is_bot_project(docker_update: DockerUpdateModel) -> bool:
+        return (docker_update.host == config.main_host.get_secret_value() and
+                docker_update.project_name == config.bot_project_name)
+
+    detected = {repository: updates for repository, updates in detected.items() if updates}
+    targets = [u for updates in detected.values() for u in updates]
+    results = await update_orchestrator.run([u for u in targets if not is_bot_project(u)])
+    results_by_target = {result.target.to_str(): result for result in results}
+
+    whole_updating_message_list = []
+    for repository, docker_update_list in detected.items():
+        updating_message_list = []
+        for docker_update in docker_update_list:
+            result = results_by_target.get(docker_update.to_str())
+            status = html.escape(result.summary()) if result else "restarting the bot to update"
+            if result and result.skipped:
+                database.add_update_event(
+                    docker_update.host, docker_update.project_name, repository, latest_digests[repository],
+                    "skipped", detail="already updating"
+                )
+            else:
+                database.add_update_event(
+                    docker_update.host, docker_update.project_name, repository, latest_digests[repository],
+                    ("updated" if result.succeeded else "failed") if result else "started",
+                    result.duration if result else None,
+                    (result.error or '\n'.join(result.last_lines)) if result and not result.succeeded else None
+                )
+            updating_message_list.append(
+                f"      Host: <b>{docker_update.host}</b>, Project: <b>{docker_update.project_name}</b> - {status}"
             )
 
-    if whole_updating_message_list:
-        await notification("\n\n".join(whole_updating_message_list), bot, parse_mode="HTML")
+        whole_updating_message_list.append(
+            f"Image <b>{repository}</b> update detected ({latest_digests[repository][-7:]})\n"
+            f"Updating to latest:\n" + "\n".join(updating_message_list)
+        )
 
-    storage.docker_updates_hashes = docker_updates_hashes
+    await notification("\n\n".join(whole_updating_message_list), bot, parse_mode="HTML")
 
+    for docker_update in {u.to_str(): u for u in filter(is_bot_project, targets)}.values():
+        ssh = ssh_manager[docker_update.host]
+        await ssh.executor.run(ssh.update, docker_update.project_name)
 
-async def main():
-    # logging.basicConfig(level=logging.DEBUG)
-    bot = Bot(
-        token=config.bot_token.get_secret_value(),
-        default=DefaultBotProperties(parse_mode=None, disable_notification=True),
-        session=AiohttpSession(proxy=config.proxy_url if config.proxy_url else None)
-    )
 
-    # scheduler
-    scheduler = AsyncIOScheduler()
-    scheduler.add_job(
-        docker_image_update_check,
-        IntervalTrigger(seconds=storage.docker_image_update_check_interval_seconds), args=(bot,)
-    )
-    scheduler.start()
+async def check_settings(bot: Bot, scheduler: AsyncIOScheduler):
+    if (result := await settings_watcher.check()) is None:
+        return
+
+    # jobs read the settings each time they run, the affected ones just run right away
+    now = datetime.now(scheduler.timezone)
+    if 'docker_updates' in result.changed:
+        scheduler.modify_job('docker_image_update_check', next_run_time=now)
+    if result.hosts_changed:
+        scheduler.modify_job('check_health', next_run_time=now)
+        scheduler.modify_job('collect_metrics', next_run_time=now)
+    if 'admin_ids' in result.changed or 'group_ids' in result.changed:
+        await set_bot_commands(bot)
+    await notification(result.summary(), bot)
 
-    # dispatcher
-    dp = Dispatcher()
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    if not config.webhook_url:
+        raise RuntimeError("webhook_enabled requires webhook_url")
+
+    app = web.Application()
+    # updates are acknowledged right away and handled in background tasks
+    SimpleRequestHandler(
+        dispatcher=dp, bot=bot, handle_in_background=True,
+        secret_token=config.webhook_secret.get_secret_value() or None
+    ).register(app, path=config.webhook_path)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, config.webhook_host, config.webhook_port).start()
+        await bot.set_webhook(
+            config.webhook_url.rstrip('/') + config.webhook_path,
+            secret_token=config.webhook_secret.get_secret_value() or None,
+            allowed_updates=dp.resolve_used_update_types(),
+            drop_pending_updates=True
+        )
+        main_logger.info(f"Webhook server listening on {config.webhook_host}:{config.webhook_port}")
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def create_dispatcher() -> Dispatcher:
+    dp = Dispatcher(storage=SQLiteStorage(database))
 
     # register startup/shutdown
     dp.startup.register(on_startup)
     dp.shutdown.register(on_shutdown)
 
     # middlewares
+    dp.update.outer_middleware(TracingMiddleware())
     dp.message.middleware(LoggerMiddleware())
+    dp.message.middleware(MetricsMiddleware())
+    dp.callback_query.middleware(MetricsMiddleware())
     dp.message.middleware(AccessMiddleware())
 
     # routers
@@ -106,10 +244,56 @@ async def main():
         admin_commands.router,
         ssh_session.router
     )
+    return dp
+
 
-    await bot.delete_webhook(drop_pending_updates=True)
+async def main():
+    # logging.basicConfig(level=logging.DEBUG)
+    bot = Bot(
+        token=config.bot_token.get_secret_value(),
+        default=DefaultBotProperties(parse_mode=None, disable_notification=True),
+        session=AiohttpSession(proxy=config.proxy_url if config.proxy_url else None)
+    )
+    bot.session.middleware(RequestMetricsMiddleware())
+
+    # scheduler
+    scheduler = AsyncIOScheduler()
+    scheduler.add_job(
+        instrumented_job(docker_image_update_check),
+        IntervalTrigger(seconds=storage.docker_image_update_check_interval_seconds), args=(bot,),
+        id='docker_image_update_check'
+    )
+    scheduler.add_job(
+        instrumented_job(collect_metrics), IntervalTrigger(seconds=storage.metrics_collect_interval_seconds),
+        id='collect_metrics'
+    )
+    scheduler.add_job(instrumented_job(save_metrics_history), IntervalTrigger(minutes=10))
+    scheduler.add_job(instrumented_job(ssh_manager.stop_idle_streams), IntervalTrigger(minutes=5))
+    scheduler.add_job(instrumented_job(ssh_manager.reap_shell_pools), IntervalTrigger(minutes=1))
+    scheduler.add_job(instrumented_job(ssh_manager.reap_idle_sessions), IntervalTrigger(minutes=1))
+    scheduler.add_job(instrumented_job(ssh_manager.check_health), IntervalTrigger(seconds=15), id='check_health')
+    scheduler.add_job(instrumented_job(check_settings), IntervalTrigger(seconds=5), args=(bot, scheduler))
+    scheduler.add_job(instrumented_job(flush_database), IntervalTrigger(seconds=5))
+    scheduler.add_job(instrumented_job(prune_database), IntervalTrigger(days=1))
+
+    # prometheus endpoint
+    metrics_runner = None
+    if config.metrics_port:
+        metrics_runner = await start_metrics_server(config.metrics_host, config.metrics_port)
+    scheduler.start()
+
+    # dispatcher
+    dp = create_dispatcher()
     await set_bot_commands(bot)
-    await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+    try:
+        if config.webhook_enabled:
+            await run_webhook(dp, bot)
+        else:
+            await bot.delete_webhook(drop_pending_updates=True)
+            await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+    finally:
+        if metrics_runner:
+            await metrics_runner.cleanup()
 
 
 def start_bot():
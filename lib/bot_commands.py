@@ -8,23 +8,33 @@ bot_admin_commands = [
     BotCommand(command='up', description='{project_name:required} - start docker project'),
     BotCommand(command='down', description='{project_name:required} - stop docker project'),
     BotCommand(command='update', description='{project_name:optional} update bot image'),
+    BotCommand(command='updates', description='show image updates in progress'),
+    BotCommand(command='history', description='{project:optional} {window:optional} image update history'),
+    BotCommand(command='audit', description='{user_id|host:optional} {window:optional} message audit log'),
     BotCommand(command='access', description='{otp_code:required} get privileged access'),
     BotCommand(command='geoip', description='{ip:required} - get geoip'),
     BotCommand(command='check_ip', description='check ip'),
     BotCommand(command='reboot', description='reboot machine'),
     BotCommand(command='prune', description='remove unused docker containers'),
-    BotCommand(command='stats', description='host statistics'),
-    BotCommand(command='logs', description='get logs'),
+    BotCommand(command='stats', description='{history [container] [window]:optional} host statistics'),
+    BotCommand(command='metrics', description='{filter:optional} bot latency and error metrics'),
+    BotCommand(command='executors', description='per host worker, queue and spare shell usage'),
+    BotCommand(command='hosts', description='host reachability and ssh latency'),
+    BotCommand(command='sessions', description='{kill:optional} {id|all:optional} list or close ssh sessions'),
+    BotCommand(command='traces', description='{filter:optional} {count:optional} recent request traces as json'),
+    BotCommand(command='logs', description='{[logger] [level] [window] | grep pattern [window]:optional} get logs'),
     BotCommand(command='curl', description='curl command'),
     BotCommand(command='openconnect', description='{status|restart|stop|start:required} manage openconnect service'),
-    BotCommand(command='activate', description='{terminal_type:optional} activate ssh session in text|image terminal'),
-    BotCommand(command='deactivate', description='deactivate ssh session'),
+    BotCommand(command='activate', description='{terminal_type:optional} {name:optional} open or switch to a named '
+                                               'ssh session in text|image terminal'),
+    BotCommand(command='shells', description='switch between your open ssh sessions'),
+    BotCommand(command='deactivate', description='close the current ssh session'),
     BotCommand(command='switch', description='switch to another ssh host'),
     BotCommand(command='wol', description='{mac: required} wake on lan'),
     BotCommand(command='follow_file', description='{location: required} follow file'),
     BotCommand(command='unfollow_file', description='stop following current file'),
     BotCommand(command='rcon_follow', description='follow rcon logs file'),
-    BotCommand(command='rcon', description='execute rcon command'),
+    BotCommand(command='rcon', description='{command:required} execute rcon commands, one per line'),
 ]
 
 
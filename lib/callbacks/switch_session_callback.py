@@ -0,0 +1,5 @@
+from aiogram.filters.callback_data import CallbackData
+
+
+class SwitchSessionCallback(CallbackData, prefix="session"):
+    session_id: int
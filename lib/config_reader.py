@@ -17,6 +17,17 @@ class Settings(BaseSettings):
     otp_secret: SecretStr
     docker_updates: Dict[str, List[DockerUpdateModel]]
     proxy_url: str = ''
+    metrics_host: str = '127.0.0.1'
+    metrics_port: int = 0
+    webhook_enabled: bool = False
+    webhook_url: str = ''
+    webhook_path: str = '/webhook'
+    webhook_secret: SecretStr = SecretStr('')
+    webhook_host: str = '0.0.0.0'
+    webhook_port: int = 8080
+    session_max_per_user: int = 3
+    session_max_total: int = 10
+    session_idle_seconds: int = 30 * 60
 
     @classmethod
     def settings_customise_sources(
@@ -35,4 +46,29 @@ class Settings(BaseSettings):
         )
 
 
+# these are only read while the bot starts up
+RESTART_FIELDS = {
+    'bot_token', 'proxy_url', 'metrics_host', 'metrics_port', 'webhook_enabled', 'webhook_url', 'webhook_path',
+    'webhook_secret', 'webhook_host', 'webhook_port'
+}
+
+
+def apply_settings(settings: Settings) -> list[str]:
+    # filters and singletons captured config.admin_ids and friends at import, so containers change in place
+    changed = []
+    for name in Settings.model_fields:
+        old, new = getattr(config, name), getattr(settings, name)
+        if old == new:
+            continue
+        if isinstance(old, list):
+            old[:] = new
+        elif isinstance(old, dict):
+            old.clear()
+            old.update(new)
+        else:
+            setattr(config, name, new)
+        changed.append(name)
+    return changed
+
+
 config = Settings()
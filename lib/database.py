@@ -0,0 +1,221 @@
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from lib.init import database_file_path
+from lib.storage import storage
+from lib.utils.general_utils import run_in_thread, DURATION_UNITS
+
+DATABASE_FLUSH_THRESHOLD = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS audit_log (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    user_id INTEGER NOT NULL,
+    username TEXT,
+    chat_id INTEGER NOT NULL,
+    host TEXT,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS audit_log_ts ON audit_log (ts);
+CREATE INDEX IF NOT EXISTS audit_log_user_ts ON audit_log (user_id, ts);
+CREATE INDEX IF NOT EXISTS audit_log_host_ts ON audit_log (host, ts);
+
+CREATE TABLE IF NOT EXISTS update_events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    host TEXT NOT NULL,
+    project TEXT NOT NULL,
+    repository TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duration REAL,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS update_events_ts ON update_events (ts);
+CREATE INDEX IF NOT EXISTS update_events_project_ts ON update_events (project, ts);
+
+CREATE TABLE IF NOT EXISTS metric_samples (
+    ts REAL NOT NULL,
+    host TEXT NOT NULL,
+    series TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS metric_samples_host_series_ts ON metric_samples (host, series, ts);
+
+CREATE TABLE IF NOT EXISTS fsm (
+    key TEXT PRIMARY KEY,
+    state TEXT,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    host TEXT NOT NULL
+);
+"""
+
+INSERT_AUDIT = "INSERT INTO audit_log (ts, user_id, username, chat_id, host, text) VALUES (?, ?, ?, ?, ?, ?)"
+INSERT_UPDATE_EVENT = ("INSERT INTO update_events (ts, host, project, repository, digest, status, duration, detail) "
+                       "VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+INSERT_METRIC_SAMPLE = "INSERT INTO metric_samples (ts, host, series, value) VALUES (?, ?, ?, ?)"
+
+
+@dataclass
+class AuditEntry:
+    ts: float
+    user_id: int
+    username: str | None
+    chat_id: int
+    host: str | None
+    text: str | None
+
+
+@dataclass
+class UpdateEvent:
+    ts: float
+    host: str
+    project: str
+    repository: str
+    digest: str
+    status: str
+    duration: float | None
+    detail: str | None
+
+
+class Database:
+    def __init__(self, filename: Path):
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(filename, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending: dict[str, list[tuple]] = {INSERT_AUDIT: [], INSERT_UPDATE_EVENT: [], INSERT_METRIC_SAMPLE: []}
+        self._pending_count = 0
+
+    def _add(self, statement: str, row: tuple) -> None:
+        with self._pending_lock:
+            self._pending[statement].append(row)
+            self._pending_count += 1
+            pending_count = self._pending_count
+        if pending_count == DATABASE_FLUSH_THRESHOLD:
+            threading.Thread(target=self.flush, daemon=True).start()
+
+    def add_audit(self, user_id: int, username: str | None, chat_id: int, host: str | None, text: str | None):
+        self._add(INSERT_AUDIT, (time.time(), user_id, username, chat_id, host, text))
+
+    def add_update_event(self, host: str, project: str, repository: str, digest: str, status: str,
+                         duration: float | None = None, detail: str | None = None):
+        self._add(INSERT_UPDATE_EVENT, (time.time(), host, project, repository, digest, status, duration, detail))
+
+    def add_metric_samples(self, rows: list[tuple[float, str, str, float]]):
+        for row in rows:
+            self._add(INSERT_METRIC_SAMPLE, row)
+
+    def flush(self) -> None:
+        with self._pending_lock:
+            pending = {statement: rows for statement, rows in self._pending.items() if rows}
+            for statement in pending:
+                self._pending[statement] = []
+            self._pending_count = 0
+
+        if not pending:
+            return
+
+        with self._lock, self._connection:
+            self._connection.execute("BEGIN")
+            for statement, rows in pending.items():
+                self._connection.executemany(statement, rows)
+
+    def audit(self, since: float, user_id: int | None = None, host: str | None = None,
+              limit: int = 50) -> list[AuditEntry]:
+        query = "SELECT ts, user_id, username, chat_id, host, text FROM audit_log WHERE ts >= ?"
+        params: list = [since]
+        if user_id is not None:
+            query += " AND user_id = ?"
+            params.append(user_id)
+        if host is not None:
+            query += " AND host = ?"
+            params.append(host)
+        query += " ORDER BY ts DESC LIMIT ?"
+        params.append(limit)
+        return [AuditEntry(*row) for row in self._query(query, params, batched=True)]
+
+    def update_history(self, since: float, project: str | None = None, limit: int = 50) -> list[UpdateEvent]:
+        query = ("SELECT ts, host, project, repository, digest, status, duration, detail "
+                 "FROM update_events WHERE ts >= ?")
+        params: list = [since]
+        if project is not None:
+            query += " AND project = ?"
+            params.append(project)
+        query += " ORDER BY ts DESC LIMIT ?"
+        params.append(limit)
+        return [UpdateEvent(*row) for row in self._query(query, params, batched=True)]
+
+    def metric_samples(self, host: str, series: str, since: float) -> tuple[list[float], list[float]]:
+        rows = self._query(
+            "SELECT ts, value FROM metric_samples WHERE host = ? AND series = ? AND ts >= ? ORDER BY ts",
+            [host, series, since], batched=True
+        )
+        return [row[0] for row in rows], [row[1] for row in rows]
+
+    def get_fsm(self, key: str) -> tuple[str | None, str] | None:
+        rows = self._query("SELECT state, data FROM fsm WHERE key = ?", [key])
+        return rows[0] if rows else None
+
+    def set_fsm(self, key: str, state: str | None, data: str) -> None:
+        if state is None and data == '{}':
+            self._execute("DELETE FROM fsm WHERE key = ?", [key])
+        else:
+            self._execute(
+                "INSERT INTO fsm (key, state, data) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET state = excluded.state, data = excluded.data",
+                [key, state, data]
+            )
+
+    def user_hosts(self) -> dict[int, str]:
+        return dict(self._query("SELECT user_id, host FROM users", []))
+
+    def set_user_host(self, user_id: int, host: str) -> None:
+        self._execute(
+            "INSERT INTO users (user_id, host) VALUES (?, ?) ON CONFLICT (user_id) DO UPDATE SET host = excluded.host",
+            [user_id, host]
+        )
+
+    def prune(self, older_than: float) -> None:
+        self.flush()
+        with self._lock, self._connection:
+            self._connection.execute("BEGIN")
+            for table in ["audit_log", "update_events", "metric_samples"]:
+                self._connection.execute(f"DELETE FROM {table} WHERE ts < ?", [older_than])
+
+    def _query(self, query: str, params: list, batched: bool = False) -> list[tuple]:
+        # only the batched tables can be behind, every other write goes straight to the connection
+        if batched:
+            self.flush()
+        with self._lock:
+            return self._connection.execute(query, params).fetchall()
+
+    def _execute(self, query: str, params: list) -> None:
+        with self._lock:
+            self._connection.execute(query, params)
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._connection.close()
+
+
+database = Database(database_file_path)
+
+
+async def flush_database():
+    await run_in_thread(database.flush)
+
+
+async def prune_database():
+    await run_in_thread(database.prune, time.time() - storage.database_retention_days * DURATION_UNITS['d'])
@@ -1,5 +1,7 @@
 from io import BytesIO
 from lib.init import fonts_folder_path
+from lib.metrics import terminal_render_seconds
+from lib.tracing import tracer
 from PIL import Image, ImageDraw, ImageFont
 import pyte
 
@@ -71,6 +73,11 @@ class EmulatedTerminal:
     def feed(self, chunk: bytes):
         self.stream.feed(chunk)
 
+    def cursor_line(self) -> str:
+        return self.screen.display[self.screen.cursor.y][:self.screen.cursor.x]
+
+    @terminal_render_seconds.time(kind='image')
+    @tracer.span('terminal.render', kind='image')
     def render(self) -> BytesIO:
         width = self.screen.columns * CELL_WIDTH
         height = self.screen.lines * CELL_HEIGHT
@@ -138,5 +145,7 @@ class EmulatedTerminal:
         bio.seek(0)
         return bio
 
+    @terminal_render_seconds.time(kind='text')
+    @tracer.span('terminal.render', kind='text')
     def text(self) -> str:
         return '\n'.join(self.screen.display)
@@ -0,0 +1,45 @@
+import json
+from typing import Any, Mapping
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey, StateType, DefaultKeyBuilder
+from lib.database import Database
+from lib.utils.general_utils import run_in_thread
+
+
+class SQLiteStorage(BaseStorage):
+    def __init__(self, db: Database):
+        self.db = db
+        self.key_builder = DefaultKeyBuilder(with_destiny=True)
+        self._cache: dict[str, tuple[str | None, dict[str, Any]]] = dict()
+
+    async def _load(self, key: StorageKey) -> tuple[str, str | None, dict[str, Any]]:
+        built_key = self.key_builder.build(key)
+        if built_key not in self._cache:
+            record = await run_in_thread(self.db.get_fsm, built_key)
+            self._cache[built_key] = (record[0], json.loads(record[1])) if record else (None, {})
+        state, data = self._cache[built_key]
+        return built_key, state, data
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        built_key, _, data = await self._load(key)
+        state = state.state if isinstance(state, State) else state
+        self._cache[built_key] = (state, data)
+        await run_in_thread(self.db.set_fsm, built_key, state, json.dumps(data))
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        _, state, _ = await self._load(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        # only json serializable values survive a restart, live objects must be kept elsewhere
+        serialized = json.dumps(dict(data))
+        built_key, state, _ = await self._load(key)
+        self._cache[built_key] = (state, json.loads(serialized))
+        await run_in_thread(self.db.set_fsm, built_key, state, serialized)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, _, data = await self._load(key)
+        return dict(data)
+
+    async def close(self) -> None:
+        self._cache.clear()
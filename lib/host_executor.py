@@ -0,0 +1,97 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, ParamSpec, TypeVar
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+class HostBusyError(RuntimeError):
+    def __init__(self, name: str, pending: int):
+        super().__init__(f"Host {name} is busy: {pending} operations are already running or queued, try again later.")
+
+
+@dataclass
+class ExecutorStats:
+    name: str
+    workers: int
+    running: int
+    queued: int
+    max_queue: int
+    completed: int
+    rejected: int
+
+
+class HostExecutor:
+    # one slow or unreachable host can only exhaust its own workers and queue, never the shared default pool
+    def __init__(self, name: str, max_workers: int = 4, max_queue: int = 16):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix=f"host-{name}")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def _release(self, call: dict) -> None:
+        # called with the lock held, whoever finishes the call first frees its slot
+        if not call["released"]:
+            call["released"] = True
+            self._pending -= 1
+
+    def _call(self, call: dict, context: contextvars.Context, func: Callable[P, R], *args: P.args) -> R:
+        with self._lock:
+            call["started"] = True
+            self._running += 1
+        try:
+            return context.run(func, *args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._release(call)
+
+    def _on_done(self, call: dict, future: asyncio.Future) -> None:
+        # a caller cancelled while the call was still queued, it will never run
+        if future.cancelled():
+            with self._lock:
+                if not call["started"]:
+                    self._release(call)
+
+    def submit(self, func: Callable[P, R], *args: P.args) -> asyncio.Future:
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise HostBusyError(self.name, self._pending)
+            self._pending += 1
+
+        call = {"started": False, "released": False}
+        future = asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(self._call, call, contextvars.copy_context(), func, *args)
+        )
+        future.add_done_callback(functools.partial(self._on_done, call))
+        return future
+
+    async def run(self, func: Callable[P, R], *args: P.args) -> R:
+        return await self.submit(func, *args)
+
+    def stats(self) -> ExecutorStats:
+        with self._lock:
+            return ExecutorStats(
+                self.name, self.max_workers, self._running, max(0, self._pending - self._running), self.max_queue,
+                self._completed, self._rejected
+            )
+
+    def idle(self) -> bool:
+        with self._lock:
+            return self._pending == 0
+
+    def shutdown(self, cancel: bool = True) -> None:
+        # without cancelling, queued calls still run, new ones are refused either way
+        self._executor.shutdown(wait=False, cancel_futures=cancel)
@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+HEALTH_SAMPLES = 120
+
+
+class HostDownError(RuntimeError):
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"Host {name} is unreachable, next attempt in {retry_in:.0f}s.")
+
+
+class CircuitBreaker:
+    # closed: calls go through, open: calls fail at once, half_open: a single call decides which one comes next
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_seconds: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            retry_in = self.opened_at + self.reset_seconds - time.monotonic()
+            if self.state == self.OPEN and retry_in <= 0:
+                self.state = self.HALF_OPEN
+                return
+            raise HostDownError(self.name, max(retry_in, 0))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                # every failed trial pushes the next one further out
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+@dataclass
+class HealthReport:
+    name: str
+    state: str
+    probes: int
+    failures: int
+    p50: float | None
+    p95: float | None
+    p99: float | None
+    last_ok: float | None
+    last_error: str
+
+
+class HostHealth:
+    def __init__(self, name: str, failure_threshold: int = 3, reset_seconds: float = 30):
+        self.name = name
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_seconds)
+        self._rtts: deque[float] = deque(maxlen=HEALTH_SAMPLES)
+        self._lock = threading.Lock()
+        self.probes = 0
+        self.failures = 0
+        self.last_ok: float | None = None
+        self.last_error = ''
+
+    def record_probe(self, rtt: float) -> None:
+        with self._lock:
+            self._rtts.append(rtt)
+            self.probes += 1
+            self.last_ok = time.time()
+        self.breaker.record_success()
+
+    def record_error(self, error: Exception) -> None:
+        with self._lock:
+            self.probes += 1
+            self.failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+        self.breaker.record_failure()
+
+    def percentile(self, samples: list[float], q: float) -> float | None:
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def report(self) -> HealthReport:
+        with self._lock:
+            samples = sorted(self._rtts)
+            return HealthReport(
+                self.name, self.breaker.state, self.probes, self.failures, self.percentile(samples, 0.5),
+                self.percentile(samples, 0.95), self.percentile(samples, 0.99), self.last_ok, self.last_error
+            )
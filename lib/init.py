@@ -19,3 +19,7 @@ fonts_folder_path = assets_folder_path / "fonts"
 keys_folder_path = secret_folder_path / ".ssh_keys"
 settings_file_path = secret_folder_path / "settings.json"
 persistent_file_path = data_folder_path / "persistent_data.json"
+metrics_folder_path = data_folder_path / "metrics"
+logs_folder_path = data_folder_path / "logs"
+geoip_folder_path = data_folder_path / "geoip"
+database_file_path = data_folder_path / "bot.sqlite3"
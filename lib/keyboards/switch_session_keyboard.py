@@ -0,0 +1,16 @@
+from lib.callbacks.switch_session_callback import SwitchSessionCallback
+from lib.session_registry import SessionEntry
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+
+def get_switch_session_keyboard(entries: list[SessionEntry], active: SessionEntry | None):
+    switch_session_keyboard_builder = InlineKeyboardBuilder()
+
+    for entry in entries:
+        switch_session_keyboard_builder.button(
+            text=f"• {entry.name}" if entry is active else entry.name,
+            callback_data=SwitchSessionCallback(session_id=entry.session_id)
+        )
+
+    switch_session_keyboard_builder.adjust(3)
+    return switch_session_keyboard_builder.as_markup()
@@ -0,0 +1,178 @@
+import gzip
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, asdict, field
+from pathlib import Path
+from typing import Iterator, TextIO
+
+LOG_SEGMENT_MAX_BYTES = 4 * 1024 * 1024
+LOG_SEGMENT_MAX_SECONDS = 24 * 60 * 60
+LOG_MAX_SEGMENTS = 60
+LOG_SEARCH_LIMIT = 1000
+
+CURRENT_SEGMENT = "current.log"
+INDEX_FILE = "index.json"
+
+
+@dataclass
+class SegmentInfo:
+    file: str
+    start: float = 0
+    end: float = 0
+    records: int = 0
+    max_level: int = logging.NOTSET
+    loggers: list[str] = field(default_factory=list)
+
+    def add(self, created: float, levelno: int, name: str):
+        if not self.records:
+            self.start = created
+        self.end = created
+        self.records += 1
+        self.max_level = max(self.max_level, levelno)
+        if name not in self.loggers:
+            self.loggers.append(name)
+
+    def matches(self, since: float, name: str | None, level: int) -> bool:
+        return self.records > 0 and self.end >= since and self.max_level >= level and \
+            (name is None or name in self.loggers)
+
+
+# record layout: created \t levelno \t logger name \t text, with continuation lines prefixed by \t
+def read_records(file: TextIO) -> Iterator[tuple[float, int, str, str]]:
+    record = None
+    for line in file:
+        line = line.rstrip('\n')
+        if line.startswith('\t'):
+            if record:
+                record[3].append(line[1:])
+            continue
+
+        if record:
+            yield record[0], record[1], record[2], '\n'.join(record[3])
+        parts = line.split('\t', 3)
+        # the current segment may end with a partially written line
+        record = (float(parts[0]), int(parts[1]), parts[2], [parts[3]]) if len(parts) == 4 else None
+
+    if record:
+        yield record[0], record[1], record[2], '\n'.join(record[3])
+
+
+class LogArchive:
+    def __init__(self, folder: Path, segment_max_bytes: int = LOG_SEGMENT_MAX_BYTES,
+                 segment_max_seconds: float = LOG_SEGMENT_MAX_SECONDS, max_segments: int = LOG_MAX_SEGMENTS):
+        self.folder = folder
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_seconds = segment_max_seconds
+        self.max_segments = max_segments
+        self._lock = threading.Lock()
+
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self._segments = self._load_index()
+        self._sequence = max((int(s.file.split('-', 1)[0]) for s in self._segments), default=0)
+
+        # leftovers of the previous run are archived right away
+        self._current = SegmentInfo(CURRENT_SEGMENT)
+        self._current_path = self.folder / CURRENT_SEGMENT
+        if self._current_path.exists():
+            with open(self._current_path, 'r', encoding='utf-8', errors='replace') as f:
+                for created, levelno, name, _ in read_records(f):
+                    self._current.add(created, levelno, name)
+        self._file = open(self._current_path, 'a', encoding='utf-8')
+        self._size = self._file.tell()
+        self._rotate()
+
+    def _load_index(self) -> list[SegmentInfo]:
+        index_path = self.folder / INDEX_FILE
+        if not index_path.exists():
+            return []
+        with open(index_path, 'r') as f:
+            segments = [SegmentInfo(**segment) for segment in json.load(f)]
+        return [segment for segment in segments if (self.folder / segment.file).exists()]
+
+    def _save_index(self):
+        index_path = self.folder / INDEX_FILE
+        tmp_path = index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump([asdict(segment) for segment in self._segments], f)
+        os.replace(tmp_path, index_path)
+
+    def write(self, created: float, levelno: int, name: str, text: str):
+        line = f"{created:.3f}\t{levelno}\t{name}\t{text.replace(chr(10), chr(10) + chr(9))}\n"
+        with self._lock:
+            if self._current.records and (self._size >= self.segment_max_bytes or
+                                          created - self._current.start >= self.segment_max_seconds):
+                self._rotate()
+            self._file.write(line)
+            self._file.flush()
+            self._size += len(line)
+            self._current.add(created, levelno, name)
+
+    def _rotate(self):
+        if not self._current.records:
+            return
+
+        self._file.close()
+        self._sequence += 1
+        started = time.strftime('%Y%m%d-%H%M%S', time.localtime(self._current.start))
+        segment_name = f"{self._sequence:06d}-{started}.log.gz"
+        tmp_path = self.folder / f"{segment_name}.tmp"
+        with open(self._current_path, 'rb') as src, gzip.open(tmp_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp_path, self.folder / segment_name)
+
+        self._current.file = segment_name
+        self._segments.append(self._current)
+        while len(self._segments) > self.max_segments:
+            (self.folder / self._segments.pop(0).file).unlink(missing_ok=True)
+        self._save_index()
+
+        self._current = SegmentInfo(CURRENT_SEGMENT)
+        self._file = open(self._current_path, 'w', encoding='utf-8')
+        self._size = 0
+
+    def _open(self, segment: SegmentInfo) -> TextIO:
+        if segment.file == CURRENT_SEGMENT:
+            return open(self._current_path, 'r', encoding='utf-8', errors='replace')
+        return gzip.open(self.folder / segment.file, 'rt', encoding='utf-8', errors='replace')
+
+    def search(self, since: float = 0, name: str | None = None, level: int = logging.NOTSET,
+               pattern: re.Pattern | None = None, limit: int = LOG_SEARCH_LIMIT) -> list[str]:
+        with self._lock:
+            segments = [s for s in self._segments + [self._current] if s.matches(since, name, level)]
+            segments = [SegmentInfo(**asdict(s)) for s in segments]
+
+        matches = deque(maxlen=limit)
+        for segment in segments:
+            try:
+                with self._open(segment) as f:
+                    for created, levelno, record_name, text in read_records(f):
+                        if created < since or levelno < level or (name is not None and record_name != name):
+                            continue
+                        if pattern is None or pattern.search(text):
+                            matches.append(text)
+            except FileNotFoundError:
+                # rotated or pruned while searching
+                continue
+        return list(matches)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class LogArchiveHandler(logging.Handler):
+    def __init__(self, archive: LogArchive):
+        super().__init__()
+        self.archive = archive
+
+    def emit(self, record):
+        try:
+            self.archive.write(record.created, record.levelno, record.name, self.format(record))
+        except Exception:
+            self.handleError(record)
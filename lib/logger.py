@@ -2,8 +2,13 @@ from io import BytesIO
 import colorama
 from colorama import Fore
 from collections import deque
+from logging.handlers import QueueHandler, QueueListener
+import atexit
 import logging
+import queue
 import sys
+from lib.init import logs_folder_path
+from lib.log_archive import LogArchive, LogArchiveHandler
 from lib.utils.general_utils import get_file_from_str
 
 
@@ -32,11 +37,13 @@ def get_formats(app_name, app_color):
 class ColoredFormatter(logging.Formatter):
     def __init__(self, app_name, app_color):
         super().__init__()
-        self.formats = get_formats(app_name, app_color)
+        self.formatters = {
+            level: logging.Formatter(log_fmt, "%Y-%m-%d %H:%M:%S")
+            for level, log_fmt in get_formats(app_name, app_color).items()
+        }
 
     def format(self, record):
-        log_fmt = self.formats.get(record.levelno)
-        formatter = logging.Formatter(log_fmt, "%Y-%m-%d %H:%M:%S")
+        formatter = self.formatters.get(record.levelno, self.formatters[logging.INFO])
         return formatter.format(record)
 
 
@@ -67,7 +74,20 @@ class LogStream:
         return bool(self.logs)
 
 
-def create_logger(name: str, app_name: str, logger_log_stream: LogStream, app_color: str):
+class LocalQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # the queue never leaves the process, so only the message is resolved here,
+        # timestamps, colors and tracebacks are formatted by the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+log_listeners: list[QueueListener] = []
+
+
+def create_logger(name: str, app_name: str, logger_log_stream: LogStream, app_color: str,
+                  logger_log_archive: LogArchive):
     colorama.init()
 
     # Init logger
@@ -77,22 +97,41 @@ def create_logger(name: str, app_name: str, logger_log_stream: LogStream, app_co
     # Create handlers
     terminal_handler = logging.StreamHandler(sys.stdout)
     log_stream_handler = logging.StreamHandler(logger_log_stream)
+    log_archive_handler = LogArchiveHandler(logger_log_archive)
 
     # Set formatters
     terminal_handler.setFormatter(ColoredFormatter(app_name, app_color))
     log_stream_handler.setFormatter(PlainFormatter(app_name))
+    log_archive_handler.setFormatter(PlainFormatter(app_name))
+
+    # Formatting and writing happen on a background thread
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(
+        log_queue, terminal_handler, log_stream_handler, log_archive_handler, respect_handler_level=True
+    )
+    listener.start()
+    log_listeners.append(listener)
 
     # Add handlers
-    logger.addHandler(terminal_handler)
-    logger.addHandler(log_stream_handler)
+    logger.addHandler(LocalQueueHandler(log_queue))
 
     return logger
 
 
+def stop_log_listeners():
+    while log_listeners:
+        log_listeners.pop().stop()
+    log_archive.close()
+
+
+atexit.register(stop_log_listeners)
+
+
 log_stream = LogStream()
+log_archive = LogArchive(logs_folder_path)
 
-main_logger = create_logger('LOGGER', 'LOGGER', log_stream, Fore.MAGENTA)
-ssh_logger = create_logger('SSH', 'SSH', log_stream, Fore.CYAN)
+main_logger = create_logger('LOGGER', 'LOGGER', log_stream, Fore.MAGENTA, log_archive)
+ssh_logger = create_logger('SSH', 'SSH', log_stream, Fore.CYAN, log_archive)
 
 if __name__ == '__main__':
     pass
@@ -0,0 +1,34 @@
+from datetime import datetime
+from io import BytesIO
+from typing import Sequence
+from matplotlib import pyplot as plt
+from matplotlib import dates as mdates
+from lib.tracing import tracer
+
+Series = tuple[Sequence[float], Sequence[float]]
+
+
+@tracer.span('matplotlib.chart')
+def create_history_chart(panels: list[tuple[str, dict[str, Series]]], title=None) -> BytesIO:
+    fig, axes = plt.subplots(len(panels), 1, figsize=(12, 4 * len(panels)), sharex=True, squeeze=False)
+
+    for ax, (ylabel, lines) in zip(axes[:, 0], panels):
+        for label, (timestamps, values) in lines.items():
+            ax.plot([datetime.fromtimestamp(t) for t in timestamps], values, label=label, linewidth=1.5)
+
+        ax.set_ylabel(ylabel)
+        ax.grid(True, color='#dddddd')
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%m-%d %H:%M'))
+        if len(lines) > 1:
+            ax.legend(loc='upper left', fontsize=8)
+
+    if title:
+        axes[0, 0].set_title(title, fontsize=14, weight='bold', pad=20)
+
+    fig.autofmt_xdate()
+
+    buffer = BytesIO()
+    plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
+    buffer.seek(0)
+    plt.close(fig)
+    return buffer
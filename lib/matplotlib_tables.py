@@ -1,7 +1,9 @@
 from matplotlib import pyplot as plt
 from io import BytesIO
+from lib.tracing import tracer
 
 
+@tracer.span('matplotlib.table')
 def create_table_matplotlib(data, headers=None, title=None) -> BytesIO:
     fig, ax = plt.subplots(figsize=(12, 8))
     ax.axis('tight')
@@ -0,0 +1,243 @@
+import asyncio
+import functools
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Awaitable, Iterator
+from aiohttp import web
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float('inf'))
+
+
+def escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{escape_label(v)}"' for k, v in labels) + '}'
+
+
+def format_bucket(bucket: float) -> str:
+    return '+Inf' if bucket == float('inf') else f'{bucket:g}'
+
+
+class Metric(ABC):
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[tuple[str, str], ...]:
+        return tuple((name, str(labels.get(name, ''))) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> Iterator[tuple[str, tuple[tuple[str, str], ...], float]]:
+        pass
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        lines += [f'{name}{format_labels(labels)} {value:g}' for name, labels, value in self.samples()]
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = dict()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self) -> dict[tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self):
+        for labels, value in sorted(self.values().items()):
+            yield f'{self.name}_total', labels, value
+
+
+class HistogramSeries:
+    def __init__(self, buckets: tuple[float, ...]):
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def copy(self) -> 'HistogramSeries':
+        series = HistogramSeries(())
+        series.counts, series.count, series.sum = list(self.counts), self.count, self.sum
+        return series
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        self._series: dict[tuple, HistogramSeries] = dict()
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            if key not in self._series:
+                self._series[key] = HistogramSeries(self.buckets)
+            series = self._series[key]
+            series.counts[idx] += 1
+            series.count += 1
+            series.sum += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def series(self) -> dict[tuple, HistogramSeries]:
+        with self._lock:
+            return {key: series.copy() for key, series in self._series.items()}
+
+    def quantile(self, series: HistogramSeries, q: float) -> float:
+        # linear interpolation inside the bucket, the same estimate as promql histogram_quantile
+        rank = q * series.count
+        cumulative = 0
+        for idx, count in enumerate(series.counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[idx - 1] if idx else 0
+                upper = self.buckets[idx] if self.buckets[idx] != float('inf') else lower
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return 0
+
+    def samples(self):
+        for labels, series in sorted(self.series().items()):
+            cumulative = 0
+            for bucket, count in zip(self.buckets, series.counts):
+                cumulative += count
+                yield f'{self.name}_bucket', labels + (('le', format_bucket(bucket)),), cumulative
+            yield f'{self.name}_count', labels, series.count
+            yield f'{self.name}_sum', labels, series.sum
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = dict()
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+    def summary(self) -> list[str]:
+        lines = []
+        for metric in self._metrics.values():
+            if isinstance(metric, Counter):
+                for labels, value in sorted(metric.values().items()):
+                    lines.append(f"{metric.name}{format_labels(labels)}: {value:g}")
+            elif isinstance(metric, Histogram):
+                for labels, series in sorted(metric.series().items()):
+                    lines.append(
+                        f"{metric.name}{format_labels(labels)}: n={series.count}, "
+                        f"avg={series.sum / series.count * 1000:.1f}ms, "
+                        f"p50={metric.quantile(series, 0.5) * 1000:.1f}ms, "
+                        f"p95={metric.quantile(series, 0.95) * 1000:.1f}ms"
+                    )
+        return lines
+
+
+metrics_registry = MetricsRegistry()
+
+handler_seconds = metrics_registry.histogram(
+    'bot_handler_seconds', 'Time spent in update handlers', ('handler',)
+)
+handler_errors = metrics_registry.counter(
+    'bot_handler_errors', 'Update handlers that raised', ('handler',)
+)
+telegram_request_seconds = metrics_registry.histogram(
+    'bot_telegram_request_seconds', 'Telegram Bot API call latency', ('method',)
+)
+telegram_requests = metrics_registry.counter(
+    'bot_telegram_requests', 'Telegram Bot API calls by result', ('method', 'status')
+)
+ssh_connect_seconds = metrics_registry.histogram(
+    'bot_ssh_connect_seconds', 'SSH connection setup time', ('host', 'kind')
+)
+ssh_exec_seconds = metrics_registry.histogram(
+    'bot_ssh_exec_seconds', 'SSH command execution time', ('host',)
+)
+ssh_probe_seconds = metrics_registry.histogram(
+    'bot_ssh_probe_seconds', 'SSH health probe round trip time', ('host',)
+)
+terminal_render_seconds = metrics_registry.histogram(
+    'bot_terminal_render_seconds', 'Emulated terminal render time', ('kind',)
+)
+job_seconds = metrics_registry.histogram(
+    'bot_job_seconds', 'Scheduler job duration', ('job',)
+)
+job_errors = metrics_registry.counter(
+    'bot_job_errors', 'Scheduler jobs that raised', ('job',)
+)
+
+
+def instrumented_job(func: Callable[..., Awaitable[None] | None]) -> Callable[..., Awaitable[None] | None]:
+    @contextmanager
+    def measure():
+        with job_seconds.time(job=func.__name__):
+            try:
+                yield
+            except Exception:
+                job_errors.inc(job=func.__name__)
+                raise
+
+    # the scheduler awaits coroutine functions but runs plain ones in its thread pool
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with measure():
+                return await func(*args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with measure():
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(text=metrics_registry.render(), content_type='text/plain', charset='utf-8')
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get('/metrics', metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
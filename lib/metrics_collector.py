@@ -0,0 +1,38 @@
+import asyncio
+import time
+from lib.database import database
+from lib.logger import main_logger
+from lib.metrics_history import metrics_history, HOST_CPU, HOST_RAM, container_series
+from lib.ssh_manager import ssh_manager
+from lib.storage import storage
+from lib.utils.general_utils import run_in_thread
+
+
+async def collect_metrics():
+    hosts = ssh_manager.get_hosts()
+    results = await asyncio.gather(
+        *(ssh_manager[host].executor.run(ssh_manager[host].get_metrics) for host in hosts),
+        return_exceptions=True
+    )
+
+    timestamp = time.time()
+    samples = []
+    for host, result in zip(hosts, results):
+        if isinstance(result, Exception):
+            main_logger.warning(f"Metrics collection failed on {host}: {result}")
+            continue
+
+        samples.append((timestamp, host, HOST_CPU, result["cpu"]))
+        samples.append((timestamp, host, HOST_RAM, result["ram"]))
+        for name, container in result["containers"].items():
+            samples.append((timestamp, host, container_series(name, "cpu"), container["cpu"]))
+            samples.append((timestamp, host, container_series(name, "mem"), container["mem"]))
+
+    for sample_timestamp, host, series, value in samples:
+        metrics_history.record(host, series, sample_timestamp, value)
+    database.add_metric_samples(samples)
+
+
+async def save_metrics_history():
+    if storage.metrics_persistence_enabled:
+        await run_in_thread(metrics_history.save)
@@ -0,0 +1,134 @@
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from lib.init import metrics_folder_path
+from lib.logger import main_logger
+from lib.storage import storage
+
+HOST_CPU = 'cpu'
+HOST_RAM = 'ram'
+
+
+def container_series(container: str, metric: str) -> str:
+    return f'{container}:{metric}'
+
+
+class RingBuffer:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._timestamps = array('d', bytes(8 * capacity))
+        self._values = array('d', bytes(8 * capacity))
+        self._start = 0
+        self._size = 0
+
+    def append(self, timestamp: float, value: float) -> None:
+        idx = (self._start + self._size) % self.capacity
+        self._timestamps[idx] = timestamp
+        self._values[idx] = value
+        if self._size < self.capacity:
+            self._size += 1
+        else:
+            self._start = (self._start + 1) % self.capacity
+
+    def _ordered(self, buffer: array) -> array:
+        end = self._start + self._size
+        if end <= self.capacity:
+            return buffer[self._start:end]
+        return buffer[self._start:] + buffer[:end - self.capacity]
+
+    def items(self, since: float = 0) -> tuple[array, array]:
+        timestamps = self._ordered(self._timestamps)
+        idx = bisect_left(timestamps, since)
+        return timestamps[idx:], self._ordered(self._values)[idx:]
+
+    def last(self) -> tuple[float, float] | None:
+        if not self._size:
+            return None
+        idx = (self._start + self._size - 1) % self.capacity
+        return self._timestamps[idx], self._values[idx]
+
+    def __len__(self):
+        return self._size
+
+
+class MetricsHistory:
+    def __init__(self, capacity: int, folder: Path | None = None):
+        self.capacity = capacity
+        self.folder = folder
+        self._hosts: dict[str, dict[str, RingBuffer]] = dict()
+
+    def record(self, host: str, series: str, timestamp: float, value: float) -> None:
+        host_series = self._hosts.setdefault(host, dict())
+        if series not in host_series:
+            host_series[series] = RingBuffer(self.capacity)
+        host_series[series].append(timestamp, value)
+
+    def get(self, host: str, series: str, since: float = 0) -> tuple[array, array]:
+        buffer = self._hosts.get(host, {}).get(series)
+        if buffer is None:
+            return array('d'), array('d')
+        return buffer.items(since)
+
+    def series(self, host: str) -> list[str]:
+        return list(self._hosts.get(host, {}).keys())
+
+    def containers(self, host: str) -> list[str]:
+        return sorted({s.split(':', 1)[0] for s in self.series(host) if ':' in s})
+
+    # file layout: repeated [name_len:H][name][count:I][timestamps:d*count][values:d*count]
+    def save(self) -> None:
+        if self.folder is None:
+            return
+
+        self.folder.mkdir(parents=True, exist_ok=True)
+        for host, host_series in self._hosts.items():
+            chunks = []
+            for name, buffer in host_series.items():
+                timestamps, values = buffer.items()
+                encoded_name = name.encode()
+                chunks.append(struct.pack('<H', len(encoded_name)) + encoded_name)
+                chunks.append(struct.pack('<I', len(timestamps)))
+                chunks.append(timestamps.tobytes() + values.tobytes())
+
+            path = self.folder / f'{host}.bin'
+            tmp_path = path.with_suffix('.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(b''.join(chunks))
+            os.replace(tmp_path, path)
+
+    def load(self) -> None:
+        if self.folder is None or not self.folder.exists():
+            return
+
+        for path in self.folder.glob('*.bin'):
+            try:
+                self._load_host(path.stem, path.read_bytes())
+            except (struct.error, UnicodeDecodeError, ValueError) as e:
+                main_logger.warning(f"Skipping corrupted metrics history {path}: {e}")
+
+    def _load_host(self, host: str, data: bytes) -> None:
+        offset = 0
+        while offset < len(data):
+            (name_len,) = struct.unpack_from('<H', data, offset)
+            offset += 2
+            name = data[offset:offset + name_len].decode()
+            offset += name_len
+            (count,) = struct.unpack_from('<I', data, offset)
+            offset += 4
+
+            timestamps = array('d', data[offset:offset + 8 * count])
+            offset += 8 * count
+            values = array('d', data[offset:offset + 8 * count])
+            offset += 8 * count
+
+            for timestamp, value in zip(timestamps[-self.capacity:], values[-self.capacity:]):
+                self.record(host, name, timestamp, value)
+
+
+metrics_history = MetricsHistory(
+    storage.metrics_history_size,
+    metrics_folder_path if storage.metrics_persistence_enabled else None
+)
+metrics_history.load()
@@ -1,7 +1,9 @@
 from aiogram import BaseMiddleware
 from aiogram.types import Message, User
 from typing import Callable, Dict, Any, Awaitable
+from lib.database import database
 from lib.logger import main_logger
+from lib.temporal_storage import temporal_storage
 
 
 class LoggerMiddleware(BaseMiddleware):
@@ -13,10 +15,9 @@ class LoggerMiddleware(BaseMiddleware):
     ) -> Any:
         user_data: User = data['event_from_user']
 
-        main_logger.info(
-            f"id: {user_data.id}, "
-            f"Username: {user_data.username}, "
-            f"message: {event.text}"
+        main_logger.info("id: %s, Username: %s, message: %s", user_data.id, user_data.username, event.text)
+        database.add_audit(
+            user_data.id, user_data.username, event.chat.id, temporal_storage.get_host(user_data.id), event.text
         )
 
         await handler(event, data)
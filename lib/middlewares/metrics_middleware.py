@@ -0,0 +1,24 @@
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import TelegramObject
+from typing import Callable, Dict, Any, Awaitable
+from lib.metrics import handler_seconds, handler_errors
+from lib.tracing import tracer
+
+
+class MetricsMiddleware(BaseMiddleware):
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        handler_object: HandlerObject | None = data.get('handler')
+        name = handler_object.callback.__name__ if handler_object else type(event).__name__
+
+        with handler_seconds.time(handler=name), tracer.span(f'handler:{name}'):
+            try:
+                return await handler(event, data)
+            except Exception:
+                handler_errors.inc(handler=name)
+                raise
@@ -0,0 +1,35 @@
+import time
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter, TelegramAPIError
+from aiogram.methods import TelegramMethod, Response
+from aiogram.methods.base import TelegramType
+from lib.metrics import telegram_request_seconds, telegram_requests
+from lib.tracing import tracer
+
+
+class RequestMetricsMiddleware(BaseRequestMiddleware):
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType[TelegramType],
+            bot: Bot,
+            method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        name = method.__api_method__
+        status = 'ok'
+        start = time.perf_counter()
+        try:
+            with tracer.span(f'telegram:{name}'):
+                return await make_request(bot, method)
+        except TelegramRetryAfter:
+            status = '429'
+            raise
+        except TelegramAPIError:
+            status = 'error'
+            raise
+        except Exception:
+            status = 'network'
+            raise
+        finally:
+            telegram_request_seconds.observe(time.perf_counter() - start, method=name)
+            telegram_requests.inc(method=name, status=status)
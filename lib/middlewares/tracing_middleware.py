@@ -0,0 +1,20 @@
+from aiogram import BaseMiddleware
+from aiogram.types import Update, User
+from typing import Callable, Dict, Any, Awaitable
+from lib.tracing import tracer
+
+
+class TracingMiddleware(BaseMiddleware):
+    async def __call__(
+            self,
+            handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+            event: Update,
+            data: Dict[str, Any]
+    ) -> Any:
+        user_data: User | None = data.get('event_from_user')
+
+        with tracer.trace(
+                f"update:{event.event_type}", update_id=event.update_id, user_id=user_data.id if user_data else None
+        ) as span:
+            data['trace_id'] = span.trace.trace_id
+            return await handler(event, data)
@@ -3,6 +3,7 @@ from aiogram.types import Message, User
 from typing import Callable, Dict, Any, Awaitable
 from lib.ssh_manager import ssh_manager
 from lib.temporal_storage import temporal_storage
+from lib.tracing import tracer
 
 
 class UserMiddleware(BaseMiddleware):
@@ -13,7 +14,8 @@ class UserMiddleware(BaseMiddleware):
             data: Dict[str, Any]
     ) -> Any:
         user_data: User = data['event_from_user']
-        user = temporal_storage.get_user(user_data.id)
-        data['user'] = user
-        data['ssh'] = ssh_manager[user.host]
+        with tracer.span('user_middleware'):
+            user = temporal_storage.get_user(user_data.id)
+            data['user'] = user
+            data['ssh'] = ssh_manager[user.host]
         await handler(event, data)
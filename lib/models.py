@@ -30,6 +30,13 @@ class HostModel(BaseModel):
     key_name: SecretStr
     docker_projects_path: str
     rcon: RconModel | None = None
+    executor_workers: int = 4
+    executor_queue_size: int = 16
+    shell_pool_size: int = 0
+    shell_pool_idle_seconds: int = 600
+    health_failure_threshold: int = 3
+    health_reset_seconds: int = 30
+    docker_stats_streams: int = 6
 
 
 class DockerUpdateModel(BaseModel):
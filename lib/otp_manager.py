@@ -34,6 +34,10 @@ class OTPManager:
         self.totp = pyotp.TOTP(otp_secret.get_secret_value())
         self.used: dict[str, datetime] = {}
 
+    def set_secret(self, otp_secret: SecretStr) -> None:
+        self.totp = pyotp.TOTP(otp_secret.get_secret_value())
+        self.used.clear()
+
     def authenticate(self, chat_id: int, code: str) -> str:
         user = self.users.get(chat_id)
         if user:
@@ -0,0 +1,75 @@
+import threading
+from dataclasses import dataclass
+
+PROC_METRICS_COMMAND = "cat /proc/stat /proc/meminfo /proc/loadavg /proc/uptime"
+
+
+@dataclass
+class HostMetrics:
+    cpu_percent: float
+    mem_total: float
+    mem_used: float
+    swap_total: float
+    swap_used: float
+    load: tuple[float, float, float]
+    uptime_seconds: float
+
+    @property
+    def mem_percent(self) -> float:
+        return 100 * self.mem_used / self.mem_total if self.mem_total else 0
+
+
+class ProcMetricsProbe:
+    def __init__(self):
+        self._previous_cpu: tuple[int, int] | None = None
+        self._lock = threading.Lock()
+
+    def parse(self, output: str) -> HostMetrics:
+        lines = output.strip().splitlines()
+        if len(lines) < 3:
+            raise ValueError(f"Unexpected /proc output: {output!r}")
+
+        # /proc/uptime and /proc/loadavg are single lines at the end of the output
+        uptime_seconds = float(lines[-1].split()[0])
+        load = tuple(float(value) for value in lines[-2].split()[:3])
+
+        cpu_times = None
+        meminfo = {}
+        for line in lines[:-2]:
+            if line.startswith('cpu '):
+                cpu_times = [int(value) for value in line.split()[1:9]]
+            elif ':' in line:
+                key, value = line.split(':', 1)
+                meminfo[key] = int(value.split()[0]) * 1024
+
+        if cpu_times is None:
+            raise ValueError("No cpu line in /proc/stat output")
+
+        mem_total = meminfo.get('MemTotal', 0)
+        mem_available = meminfo.get('MemAvailable', meminfo.get('MemFree', 0))
+        swap_total = meminfo.get('SwapTotal', 0)
+
+        return HostMetrics(
+            cpu_percent=self._cpu_percent(cpu_times),
+            mem_total=mem_total,
+            mem_used=mem_total - mem_available,
+            swap_total=swap_total,
+            swap_used=swap_total - meminfo.get('SwapFree', 0),
+            load=load,
+            uptime_seconds=uptime_seconds
+        )
+
+    def _cpu_percent(self, cpu_times: list[int]) -> float:
+        # user nice system idle iowait irq softirq steal
+        idle = cpu_times[3] + cpu_times[4]
+        total = sum(cpu_times)
+
+        with self._lock:
+            previous = self._previous_cpu
+            self._previous_cpu = (idle, total)
+
+        # the first sample has nothing to compare with, so it is the average since boot
+        if previous is not None and total > previous[1]:
+            idle, total = idle - previous[0], total - previous[1]
+
+        return 100 * (total - idle) / total if total else 0
@@ -1,29 +1,41 @@
 import asyncio
+import html
+import json
+import logging
+import re
 import time
-from io import BytesIO
 from aiogram import Router, types, F
 from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
 from aiogram.types import BufferedInputFile
 from aiogram.utils.chat_action import ChatActionMiddleware
-from rcon.source import rcon
 from lib.bot_commands import text_bot_admin_commands
 from lib.callbacks.switch_host_callback import SwitchHostCallback
+from lib.database import database
 from lib.keyboards.switch_host_keyboard import get_switch_host_keyboard
-from lib.logger import log_stream
+from lib.keyboards.switch_session_keyboard import get_switch_session_keyboard
+from lib.logger import log_stream, log_archive, main_logger, ssh_logger
+from lib.matplotlib_charts import create_history_chart
 from lib.matplotlib_tables import create_table_matplotlib
+from lib.metrics import metrics_registry
+from lib.metrics_history import metrics_history, HOST_CPU, HOST_RAM, container_series
 from lib.middlewares.user_middleware import UserMiddleware
 from lib.otp_manager import otp_manager, OTP_ACCESS_GRANTED_HOURS
 from lib.models import TerminalType
-from lib.ssh_commands import SSHCommands
+from lib.ssh_commands import SSHCommands, ComposeResult
 from lib.ssh_manager import ssh_manager
 from lib.states.confirmation_state import ConfirmationState
 from lib.states.ssh_session_state import SSHSessionState
-from lib.temporal_storage import User
-from lib.utils.general_utils import run_in_thread
+from lib.storage import storage
+from lib.temporal_storage import User, temporal_storage
+from lib.tracing import tracer
+from lib.update_orchestrator import update_orchestrator
+from lib.utils.general_utils import run_in_thread, parse_duration, is_duration, format_size, format_duration, \
+    get_file_from_str
 from lib.utils.regex_utils import is_valid_mac_address
-from lib.utils.message_utils import get_args, large_respond
-from lib.api.geoip_api import geoip
+from lib.utils.message_utils import get_args, large_respond, stdout_callback_generator
+from lib.api.geoip_api import geoip, geoip_client
 from lib.config_reader import config
 
 router = Router()
@@ -45,45 +57,105 @@ async def h_cmd(message: types.Message):
 
 
 @router.message(Command("stats"))
-async def stats_cmd(message: types.Message, user: User, ssh: SSHCommands):
-    answer = await message.answer("gathering statistics...")
-    containers_ps, containers_stats, ram, cpu, uptime = await run_in_thread(ssh.get_stats)
-
-    containers_data = {}
-    for c in containers_ps:
-        containers_data[c["Names"]] = c
+async def stats_cmd(message: types.Message, command: CommandObject, user: User, ssh: SSHCommands):
+    args = get_args(command, 0, 3)
+    if args:
+        if args[0] != 'history':
+            return await message.answer('invalid syntax, stats history [container] [window]')
+        return await stats_history(message, user, args[1:])
 
-    for c in containers_stats:
-        containers_data[c["Name"]] |= c
+    answer = await message.answer("gathering statistics...")
+    containers, containers_stats, host_metrics = await ssh.executor.run(ssh.get_stats)
 
     headers = ["Name", "Image", "CPUPerc", "MemUsage", "Status"]
     data = []
-    for c in containers_data.values():
-        data.append([c["Name"], c["Image"], c["CPUPerc"], c["MemUsage"].split(' /')[0], c["Status"]])
+    for c in containers:
+        name = c["Names"][0].lstrip('/')
+        stats = containers_stats.get(name)
+        data.append([
+            name, c["Image"],
+            f"{stats.cpu_percent:.2f}%" if stats else "-",
+            format_size(stats.mem_usage) if stats else "-",
+            c["Status"]
+        ])
 
     table_containers_image = create_table_matplotlib(data, headers)
     file = BufferedInputFile(table_containers_image.read(), filename="img.png")
 
     await answer.delete()
     await message.answer_photo(
-        file, caption=f'Stats <b>{user.host}</b> {time.strftime("%Y-%m-%d %H:%M:%S")}',
+        file, caption=f'Stats <b>{user.host}</b> {time.strftime("%Y-%m-%d %H:%M:%S")}\n'
+                      f'CPU: {host_metrics.cpu_percent:.1f}%, '
+                      f'RAM: {format_size(host_metrics.mem_used)}/{format_size(host_metrics.mem_total)}, '
+                      f'Load: {" ".join(f"{load:.2f}" for load in host_metrics.load)}, '
+                      f'Uptime: {format_duration(host_metrics.uptime_seconds)}',
         parse_mode="html"
     )
 
 
+async def stats_history(message: types.Message, user: User, args: list[str]):
+    window = '1h'
+    if args and is_duration(args[-1]):
+        window = args.pop()
+    if len(args) > 1:
+        return await message.answer('invalid syntax, stats history [container] [window]')
+
+    since = time.time() - parse_duration(window)
+
+    async def get_series(series: str):
+        timestamps, values = metrics_history.get(user.host, series, since)
+        # older samples than the in-memory ring buffer holds come from the database
+        if not timestamps or timestamps[0] - since > 2 * storage.metrics_collect_interval_seconds:
+            return await run_in_thread(database.metric_samples, user.host, series, since)
+        return timestamps, values
+
+    if args:
+        container = args[0]
+        if container not in metrics_history.containers(user.host):
+            return await message.answer(f"No history for container {container} on {user.host}!")
+
+        timestamps, mem = await get_series(container_series(container, "mem"))
+        panels = [
+            ("CPU, %", {container: await get_series(container_series(container, "cpu"))}),
+            ("Memory, MiB", {container: (timestamps, [m / 1024 ** 2 for m in mem])}),
+        ]
+        title = f'{container} on {user.host}, last {window}'
+    else:
+        panels = [
+            ("CPU, %", {user.host: await get_series(HOST_CPU)}),
+            ("RAM, %", {user.host: await get_series(HOST_RAM)}),
+        ]
+        title = f'{user.host}, last {window}'
+
+    if not any(len(timestamps) for _, lines in panels for timestamps, _ in lines.values()):
+        return await message.answer(f"No metrics collected for {user.host} in the last {window}.")
+
+    chart = create_history_chart(panels, title)
+    file = BufferedInputFile(chart.read(), filename="history.png")
+    return await message.answer_photo(file)
+
+
 @router.message(Command("projects"))
 async def projects_cmd(message: types.Message, ssh: SSHCommands):
-    docker_projects = ssh.get_docker_projects()
+    docker_projects = await ssh.executor.run(ssh.get_docker_projects)
     await message.answer('\n'.join(docker_projects))
 
 
+def compose_result_text(project_name: str, result: ComposeResult) -> str:
+    if result.exit_status != 0:
+        return result.output or f"docker compose failed for {project_name} with status {result.exit_status}"
+    if not result.containers:
+        return f"{project_name}: no containers"
+    return '\n'.join(
+        f"{c['Names'][0].lstrip('/')}: {c['State']} ({c['Status']})" for c in result.containers
+    )
+
+
 @router.message(Command("up"))
 async def up_cmd(message: types.Message, command: CommandObject, ssh: SSHCommands):
     args = get_args(command, 1, 1)
-    error = ssh.up_project(args[0])
-    if error:
-        return await message.answer(error)
-    return await message.answer('good')
+    result = await ssh.executor.run(ssh.up_project, args[0])
+    return await large_respond(message, compose_result_text(args[0], result))
 
 
 @router.message(Command("down"))
@@ -92,15 +164,13 @@ async def down_cmd(message: types.Message, command: CommandObject, ssh: SSHComma
     if args[0] == config.bot_project_name:
         return await message.answer("Nah, you won't do that!")
 
-    error = ssh.down_project(args[0])
-    if error:
-        return await message.answer(error)
-    return await message.answer('good')
+    result = await ssh.executor.run(ssh.down_project, args[0])
+    return await large_respond(message, compose_result_text(args[0], result))
 
 
 @router.message(Command("prune"))
 async def prune_cmd(message: types.Message, ssh: SSHCommands):
-    result = ssh.docker_prune()
+    result = await ssh.executor.run(ssh.docker_prune)
     return await large_respond(message, result)
 
 
@@ -108,7 +178,7 @@ async def prune_cmd(message: types.Message, ssh: SSHCommands):
 async def update_cmd(message: types.Message, command: CommandObject, ssh: SSHCommands, state: FSMContext):
     args = get_args(command, 0, 1)
     project = args[0] if len(args) > 0 else config.bot_project_name
-    all_projects = ssh.get_docker_projects()
+    all_projects = await ssh.executor.run(ssh.get_docker_projects)
     if project not in all_projects:
         return await message.answer(f"Project {project} not found!")
 
@@ -123,7 +193,7 @@ async def update(message: types.Message, ssh: SSHCommands, state: FSMContext):
     await state.clear()
     if message.text == "y":
         await message.answer('performing project update...')
-        bot_update_log_file = ssh.update(project_name)
+        bot_update_log_file = await ssh.executor.run(ssh.update, project_name)
 
         async def callback(text: str):
             await large_respond(message, text)
@@ -133,6 +203,62 @@ async def update(message: types.Message, ssh: SSHCommands, state: FSMContext):
         await message.answer('abort')
 
 
+@router.message(Command("updates"))
+async def updates_cmd(message: types.Message):
+    if not update_orchestrator.in_progress:
+        return await message.answer("No updates in progress.")
+    return await large_respond(message, [
+        f"{target}: {progress.summary()}" for target, progress in update_orchestrator.in_progress.items()
+    ])
+
+
+@router.message(Command("history"))
+async def history_cmd(message: types.Message, command: CommandObject):
+    args = get_args(command, 0, 2)
+    window = args.pop() if args and is_duration(args[-1]) else '30d'
+    if len(args) > 1:
+        return await message.answer('invalid syntax, history [project] [window]')
+
+    events = await run_in_thread(
+        database.update_history, time.time() - parse_duration(window), args[0] if args else None
+    )
+    if not events:
+        return await message.answer(f"No updates in the last {window}.")
+
+    return await large_respond(message, [
+        f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(e.ts))} {e.host}/{e.project} "
+        f"{e.repository} ({e.digest[-7:]}): {e.status}" + (f" in {e.duration:.0f}s" if e.duration else "")
+        for e in events
+    ])
+
+
+@router.message(Command("audit"))
+async def audit_cmd(message: types.Message, command: CommandObject):
+    args = get_args(command, 0, 2)
+    window = args.pop() if args and is_duration(args[-1]) else '1d'
+    if len(args) > 1:
+        return await message.answer('invalid syntax, audit [user_id|host] [window]')
+
+    user_id = host = None
+    if args:
+        if args[0].lstrip('-').isdigit():
+            user_id = int(args[0])
+        elif args[0] in ssh_manager.get_hosts():
+            host = args[0]
+        else:
+            return await message.answer(f"{args[0]} is neither a user id nor a host!")
+
+    entries = await run_in_thread(database.audit, time.time() - parse_duration(window), user_id, host)
+    if not entries:
+        return await message.answer(f"No messages in the last {window}.")
+
+    return await large_respond(message, [
+        f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(e.ts))} {e.username or e.user_id}"
+        f"{f'@{e.host}' if e.host else ''}: {e.text}"
+        for e in entries
+    ])
+
+
 @router.message(Command("access"))
 async def access_cmd(message: types.Message, command: CommandObject):
     args = get_args(command, 1, 1)
@@ -152,21 +278,140 @@ async def reboot_cmd(message: types.Message, state: FSMContext):
 async def reboot(message: types.Message, ssh: SSHCommands, state: FSMContext):
     if message.text.lower() == "bipki":
         await message.answer('performing reboot...')
-        ssh.reboot()
+        await ssh.executor.run(ssh.reboot)
     else:
         await message.answer('abort')
     return await state.clear()
 
 
 @router.message(Command("logs"))
-async def logs_cmd(message: types.Message):
-    file = BufferedInputFile(log_stream.get_file().read(), filename="logs.txt")
+async def logs_cmd(message: types.Message, command: CommandObject):
+    args = get_args(command)
+    if not args:
+        file = BufferedInputFile(log_stream.get_file().read(), filename="logs.txt")
+        return await message.answer_document(file)
+
+    window = args.pop() if args and is_duration(args[-1]) else '1d'
+    name = pattern = None
+    level = logging.NOTSET
+    if args and args[0] == 'grep':
+        if len(args) < 2:
+            return await message.answer('invalid syntax, logs grep <pattern> [window]')
+        try:
+            pattern = re.compile(' '.join(args[1:]), re.IGNORECASE)
+        except re.error as e:
+            return await message.answer(f"Invalid pattern: {e}")
+    else:
+        for arg in args:
+            if arg.upper() in logging.getLevelNamesMapping():
+                level = logging.getLevelNamesMapping()[arg.upper()]
+            elif arg.upper() in (main_logger.name, ssh_logger.name):
+                name = arg.upper()
+            else:
+                return await message.answer(
+                    'invalid syntax, logs [logger] [level] [window] or logs grep <pattern> [window]'
+                )
+
+    lines = await run_in_thread(log_archive.search, time.time() - parse_duration(window), name, level, pattern)
+    if not lines:
+        return await message.answer(f"No logs found in the last {window}.")
+
+    file = BufferedInputFile(get_file_from_str('\n'.join(lines), 'logs.txt').read(), filename="logs.txt")
+    return await message.answer_document(file)
+
+
+@router.message(Command("metrics"))
+async def metrics_cmd(message: types.Message, command: CommandObject):
+    args = get_args(command, 0, 1)
+    lines = [line for line in metrics_registry.summary() if not args or args[0] in line]
+    return await large_respond(message, lines)
+
+
+@router.message(Command("executors"))
+async def executors_cmd(message: types.Message):
+    return await large_respond(message, [
+        f"{s.name}: {s.running}/{s.workers} running, {s.queued}/{s.max_queue} queued, "
+        f"{s.completed} completed, {s.rejected} rejected"
+        for s in (ssh_manager[host].executor.stats() for host in ssh_manager.get_hosts())
+    ] + ["", "Shell pools:"] + ssh_manager.shell_pool_stats())
+
+
+@router.message(Command("hosts"))
+async def hosts_cmd(message: types.Message):
+    states = {'closed': 'up', 'open': 'DOWN', 'half_open': 'recovering'}
+
+    def ms(value: float | None) -> str:
+        return f"{value * 1000:.1f}ms" if value is not None else "-"
+
+    lines = []
+    for r in ssh_manager.health_reports():
+        line = f"{r.name}: {states[r.state]}, rtt p50 {ms(r.p50)} p95 {ms(r.p95)} p99 {ms(r.p99)}, " \
+               f"{r.failures}/{r.probes} probes failed"
+        if r.state != 'closed':
+            last_ok = f"{format_duration(time.time() - r.last_ok)} ago" if r.last_ok else "never"
+            line += f", last ok {last_ok}, {r.last_error}"
+        lines.append(line)
+    return await large_respond(message, lines)
+
+
+@router.message(Command("sessions"))
+async def sessions_cmd(message: types.Message, command: CommandObject, fsm_storage: BaseStorage):
+    args = get_args(command, 0, 2)
+    if not args:
+        entries = ssh_manager.sessions.entries()
+        if not entries:
+            return await message.answer("No SSH sessions open.")
+        return await large_respond(message, [
+            f"#{e.session_id} {e.name} of user {e.user_id}: {e.session.name} "
+            f"({TerminalType(e.session.terminal_type).value}), "
+            f"open {format_duration(time.time() - e.created_at)}, idle {format_duration(e.idle_seconds)}"
+            for e in entries
+        ] + [
+            f"{len(entries)}/{ssh_manager.sessions.max_total} sessions, "
+            f"idle ones close after {format_duration(ssh_manager.sessions.idle_seconds)}"
+        ])
+
+    if args[0] != 'kill' or len(args) != 2 or not (args[1] == 'all' or args[1].isdigit()):
+        return await message.answer('invalid syntax, /sessions [kill id|all]')
+
+    if args[1] == 'all':
+        entries = ssh_manager.sessions.entries()
+    elif (entry := ssh_manager.sessions.get(int(args[1]))) is not None:
+        entries = [entry]
+    else:
+        return await message.answer(f"No session #{args[1]}.")
+
+    for entry in entries:
+        await ssh_manager.sessions.remove(entry)
+        # otherwise the owner's next message would reconnect the killed session
+        key = StorageKey(message.bot.id, entry.chat_id, entry.user_id)
+        data = await fsm_storage.get_data(key)
+        sessions = data.get("sessions", {})
+        sessions.pop(entry.name, None)
+        if not sessions:
+            await fsm_storage.set_state(key, None)
+            await fsm_storage.set_data(key, {})
+        else:
+            active = data.get("active")
+            await fsm_storage.set_data(key, {"sessions": sessions, "active": None if active == entry.name else active})
+    return await message.answer(f"Closed {len(entries)} SSH sessions.")
+
+
+@router.message(Command("traces"))
+async def traces_cmd(message: types.Message, command: CommandObject):
+    args = get_args(command, 0, 2)
+    limit = int(args.pop()) if args and args[-1].isdigit() else 20
+    traces = tracer.export(args[0] if args else None, limit)
+    if not traces:
+        return await message.answer("No traces found.")
+
+    file = BufferedInputFile(json.dumps(traces, indent=2, default=str).encode(), filename="traces.json")
     return await message.answer_document(file)
 
 
 @router.message(Command("curl"))
 async def curl_cmd(message: types.Message, ssh: SSHCommands, command: CommandObject):
-    result, error = ssh.curl(command.args)
+    result, error = await ssh.executor.run(ssh.curl, command.args)
     if not result:
         return await message.answer(error)
     return await message.answer(result)
@@ -177,8 +422,8 @@ async def geoip_cmd(message: types.Message, command: CommandObject):
     args = get_args(command, 1, 1)
 
     try:
-        json = await geoip(args[0])
-        text = '\n'.join(f"{key}: {val}" for key, val in json.items())
+        ip_info = await geoip(args[0])
+        text = '\n'.join(f"{key}: {val}" for key, val in ip_info.items())
     except Exception as e:
         return await message.answer(str(e))
     return await message.answer(text)
@@ -188,14 +433,17 @@ async def geoip_cmd(message: types.Message, command: CommandObject):
 async def check_ip_cmd(message: types.Message, ssh: SSHCommands):
     response = ""
     msg = await message.answer("checking ip...")
-    for url in ["eth0.me", "2ip.ru", "ifconfig.co", "ifconfig.me"]:
-        result, error = ssh.curl(url)
-        if not result:
-            break
-        ip = result.strip()
-        ip_info = await geoip(ip)
-        ip_info_text = '\n'.join(f"{key}: {val}" for key, val in ip_info.items())
-        response += f"<b>{url}: {ip}</b>\n\n{ip_info_text}\n\n"
+    urls = ["eth0.me", "2ip.ru", "ifconfig.co", "ifconfig.me"]
+    results = await asyncio.gather(*(ssh.executor.run(ssh.curl, url) for url in urls))
+    ips = {url: result.strip() for url, (result, error) in zip(urls, results) if result.strip()}
+
+    # the services usually agree, so this is a single lookup most of the time
+    ip_infos = await geoip_client.lookup_many(ips.values())
+    for url, ip in ips.items():
+        ip_info = ip_infos[ip]
+        ip_info_text = str(ip_info) if isinstance(ip_info, Exception) else \
+            '\n'.join(f"{key}: {val}" for key, val in ip_info.items())
+        response += f"<b>{url}: {html.escape(ip)}</b>\n\n{html.escape(ip_info_text)}\n\n"
 
     if not response:
         response = "no data"
@@ -209,52 +457,44 @@ async def openconnect_cmd(message: types.Message, command: CommandObject, ssh: S
     if args[0] not in ['status', 'restart', 'stop', 'start']:
         return await message.answer('invalid syntax, openconnect status|restart|stop|start')
 
-    result, error = ssh.openconnect(args[0])
+    result, error = await ssh.executor.run(ssh.openconnect, args[0])
     if not result:
         return await large_respond(message, error)
     return await large_respond(message, result)
 
 
-def stdout_callback_image_generator(message: types.Message):
-    async def stdout_callback(chunk: BytesIO):
-        try:
-            input_file = BufferedInputFile(chunk.read(), filename="terminal.png")
-            await message.answer_photo(input_file)
-        except Exception as e:
-            await message.answer(str(e))
-
-    return stdout_callback
-
-
-def stdout_callback_text_generator(message: types.Message):
-    async def stdout_callback(chunk: str):
-        if not chunk:
-            return
-        try:
-            await message.answer(f'```bash\n{chunk}```', parse_mode='Markdown')
-        except Exception as e:
-            await message.answer(str(e))
-
-    return stdout_callback
-
-
 @router.message(Command("activate"), flags={'otp': True})
 async def activate_cmd(message: types.Message, state: FSMContext, user: User, command: CommandObject):
     terminal_type = 'text'
-    args = get_args(command, 0, 1)
-    if len(args) == 1:
-        terminal_type = args[0]
-        if terminal_type not in TerminalType:
-            return await message.answer('Invalid terminal type! Should be text|image.')
-
-    await message.answer(f'SSH session activated in {terminal_type} terminal! To deactivate enter /deactivate\n')
-    await state.set_state(SSHSessionState.session_activated)
-    ssh_session = ssh_manager.interactive_session(user.host, terminal_type)
-    await ssh_session.connect(
-        stdout_callback_text_generator(message) if terminal_type == TerminalType.text else
-        stdout_callback_image_generator(message)
+    args = get_args(command, 0, 2)
+    if args and args[0] in TerminalType:
+        terminal_type = args.pop(0)
+    if len(args) > 1:
+        return await message.answer('invalid syntax, /activate [text|image] [name]')
+    if args and args[0] in TerminalType:
+        return await message.answer(f'Session name {args[0]} is taken by a terminal type, choose another one.')
+
+    data = await state.get_data()
+    sessions = data.get("sessions", {})
+    if args and (entry := ssh_manager.sessions.find(message.from_user.id, args[0])) is not None:
+        await state.update_data(active=entry.name)
+        await message.answer(f'Switched to SSH session {entry.name}!')
+        return await ssh_manager.switch_session(entry)
+
+    entry = await ssh_manager.open_session(
+        message.from_user.id, message.chat.id,
+        args[0] if args else ssh_manager.sessions.free_name(message.from_user.id, user.host),
+        user.host, terminal_type, stdout_callback_generator(message, terminal_type)
     )
-    return await state.update_data(ssh_session=ssh_session)
+    entries = ssh_manager.sessions.user_entries(message.from_user.id)
+    await message.answer(
+        f'SSH session {entry.name} to {user.host} activated in {terminal_type} terminal! '
+        f'To switch sessions enter /shells, to deactivate enter /deactivate\n',
+        reply_markup=get_switch_session_keyboard(entries, entry) if len(entries) > 1 else None
+    )
+    await state.set_state(SSHSessionState.session_activated)
+    sessions[entry.name] = {"host": user.host, "terminal_type": terminal_type}
+    return await state.set_data({"sessions": sessions, "active": entry.name})
 
 
 @router.message(Command("switch"))
@@ -266,8 +506,8 @@ async def switch_cmd(message: types.Message):
 
 
 @router.callback_query(SwitchHostCallback.filter())
-async def switch(callback: types.CallbackQuery, callback_data: SwitchHostCallback, user: User):
-    user.host = callback_data.host
+async def switch(callback: types.CallbackQuery, callback_data: SwitchHostCallback):
+    user = await temporal_storage.set_host(callback.from_user.id, callback_data.host)
     return await callback.answer(f'Host has been switched to {user.host}!')
 
 
@@ -277,7 +517,7 @@ async def wol_cmd(message: types.Message, command: CommandObject, ssh: SSHComman
     if not is_valid_mac_address(args[0]):
         return await message.answer('invalid syntax, wakeonlan {mac address}')
 
-    result, error = ssh.wakeonlan(args[0])
+    result, error = await ssh.executor.run(ssh.wakeonlan, args[0])
     if not result:
         return await large_respond(message, error)
     return await large_respond(message, result)
@@ -331,12 +571,17 @@ async def rcon_follow_cmd(message: types.Message, user: User, ssh: SSHCommands):
 
 @router.message(Command('rcon'))
 async def rcon_cmd(message: types.Message, command: CommandObject, user: User):
-    args = get_args(command, 1)
-    rcon_settings = ssh_manager.get_host(user.host).rcon
-    if rcon_settings is None:
+    get_args(command, 1)
+    rcon_client = ssh_manager.get_rcon(user.host)
+    if rcon_client is None:
         return await message.answer("RCON settings not set!")
 
-    response = await rcon(*args, host=rcon_settings.address, port=rcon_settings.port, passwd=rcon_settings.password)
-    if response:
-        await message.answer(response)
-    return None
+    # one command per line, all of them are sent over the same connection at once
+    commands = [line.strip() for line in command.args.splitlines() if line.strip()]
+    responses = await rcon_client.commands(commands)
+    if len(commands) == 1:
+        return await message.answer(responses[0]) if responses[0] else None
+    return await large_respond(message, [
+        f"> {rcon_command}\n{response}" if response else f"> {rcon_command}"
+        for rcon_command, response in zip(commands, responses)
+    ])
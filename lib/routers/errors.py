@@ -1,7 +1,10 @@
 from aiogram import Router
 from aiogram.types import ErrorEvent
 from aiogram.exceptions import TelegramAPIError, TelegramBadRequest
+from lib.host_executor import HostBusyError
+from lib.host_health import HostDownError
 from lib.logger import main_logger
+from lib.session_registry import SessionLimitError
 
 router = Router()
 
@@ -20,6 +23,9 @@ async def error_handler(event: ErrorEvent):
             await safe_send(event.update, "That caption was too long for Telegram!")
         else:
             await safe_send(event.update, f"Telegram rejected the message. {str(exception)}")
+    elif isinstance(exception, (HostBusyError, HostDownError, SessionLimitError)):
+        await safe_send(event.update, str(exception))
+        return main_logger.warning(str(exception))
     elif isinstance(exception, TelegramAPIError):
         await safe_send(event.update, f"Telegram server is having a moment. {str(exception)}")
     else:
@@ -1,27 +1,96 @@
 from aiogram import Router, types, F
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
+from lib.callbacks.switch_session_callback import SwitchSessionCallback
 from lib.config_reader import config
+from lib.keyboards.switch_session_keyboard import get_switch_session_keyboard
+from lib.otp_manager import otp_manager
 from lib.ssh_interactive_session import SSHInteractiveSession
+from lib.ssh_manager import ssh_manager
 from lib.states.ssh_session_state import SSHSessionState
+from lib.utils.message_utils import stdout_callback_generator
 
 router = Router()
 router.message.filter(F.from_user.id.in_(config.admin_ids))
 router.message.filter(SSHSessionState.session_activated)
 
 
+async def get_ssh_session(message: types.Message, state: FSMContext) -> SSHInteractiveSession | None:
+    ssh_session = ssh_manager.get_session(message.from_user.id)
+    if ssh_session is not None:
+        return ssh_session
+
+    # the bot was restarted while the session was active, reconnect with the stored settings
+    data = await state.get_data()
+    settings = data.get("sessions", {}).get(data.get("active"))
+    if settings is None:
+        await message.answer('No active SSH session, pick one with /shells!' if data.get("sessions")
+                             else 'No SSH session found!')
+        return None
+    if not otp_manager.is_authenticated(message.from_user.id):
+        # the otp grant only lives in memory, a stored session must not outlast it
+        await state.clear()
+        await message.answer('SSH session expired, authenticate and /activate it again!')
+        return None
+    if settings["host"] not in ssh_manager.get_hosts():
+        # the host was removed from the settings in the meantime
+        await state.clear()
+        await message.answer(f'Host {settings["host"]} no longer exists, SSH session closed!')
+        return None
+
+    entry = await ssh_manager.open_session(
+        message.from_user.id, message.chat.id, data["active"], settings["host"], settings["terminal_type"],
+        stdout_callback_generator(message, settings["terminal_type"])
+    )
+    await message.answer(f'SSH session {entry.name} to {settings["host"]} restored!')
+    return entry.session
+
+
 @router.message(Command("deactivate"))
 async def deactivate_cmd(message: types.Message, state: FSMContext):
-    ssh_session: SSHInteractiveSession = (await state.get_data()).get("ssh_session")
-    ssh_session.close()
-    await state.clear()
-    return await message.answer('SSH session deactivated!')
+    entry = ssh_manager.sessions.active(message.from_user.id)
+    await ssh_manager.close_session(message.from_user.id)
+
+    data = await state.get_data()
+    sessions = data.get("sessions", {})
+    sessions.pop(entry.name if entry else data.get("active"), None)
+    if not (remaining := ssh_manager.sessions.user_entries(message.from_user.id)):
+        await state.clear()
+        return await message.answer('SSH session deactivated!')
+
+    active = remaining[-1]
+    await state.set_data({"sessions": sessions, "active": active.name})
+    await message.answer(f'SSH session deactivated! Switched to {active.name}.')
+    return await ssh_manager.switch_session(active)
+
+
+@router.message(Command("shells"))
+async def shells_cmd(message: types.Message):
+    entries = ssh_manager.sessions.user_entries(message.from_user.id)
+    if not entries:
+        return await message.answer('No SSH sessions open!')
+
+    return await message.answer(
+        "Your SSH sessions",
+        reply_markup=get_switch_session_keyboard(entries, ssh_manager.sessions.active(message.from_user.id))
+    )
+
+
+@router.callback_query(SwitchSessionCallback.filter())
+async def switch_session(callback: types.CallbackQuery, callback_data: SwitchSessionCallback, state: FSMContext):
+    entry = ssh_manager.sessions.get(callback_data.session_id)
+    if entry is None or entry.user_id != callback.from_user.id:
+        return await callback.answer('This SSH session is already closed!')
+
+    await callback.answer(f'Switched to {entry.name}!')
+    await state.update_data(active=entry.name)
+    return await ssh_manager.switch_session(entry)
 
 
 @router.message()
 async def command(message: types.Message, state: FSMContext):
-    ssh_session: SSHInteractiveSession = (await state.get_data()).get("ssh_session")
+    ssh_session = await get_ssh_session(message, state)
     if not ssh_session:
-        return await message.answer('No SSH session found!')
+        return None
 
     return ssh_session.send_command(message.text)
@@ -0,0 +1,109 @@
+import asyncio
+import itertools
+import time
+from dataclasses import dataclass, field
+from lib.logger import ssh_logger
+from lib.ssh_interactive_session import SSHInteractiveSession
+from lib.utils.general_utils import run_in_thread
+
+
+class SessionLimitError(RuntimeError):
+    pass
+
+
+@dataclass
+class SessionEntry:
+    session_id: int
+    user_id: int
+    chat_id: int
+    name: str
+    session: SSHInteractiveSession
+    created_at: float = field(default_factory=time.time)
+
+    @property
+    def idle_seconds(self) -> float:
+        return time.monotonic() - self.session.last_activity
+
+
+class SessionRegistry:
+    # every interactive session and its reader task, so none outlives its owner or the configured limits
+    def __init__(self, max_per_user: int, max_total: int, idle_seconds: int):
+        self.max_per_user = max_per_user
+        self.max_total = max_total
+        self.idle_seconds = idle_seconds
+        self._entries: dict[int, SessionEntry] = dict()
+        self._active: dict[int, int] = dict()
+        self._ids = itertools.count(1)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def entries(self) -> list[SessionEntry]:
+        return list(self._entries.values())
+
+    def user_entries(self, user_id: int) -> list[SessionEntry]:
+        return [entry for entry in self._entries.values() if entry.user_id == user_id]
+
+    def get(self, session_id: int) -> SessionEntry | None:
+        return self._entries.get(session_id)
+
+    def find(self, user_id: int, name: str) -> SessionEntry | None:
+        return next((entry for entry in self.user_entries(user_id) if entry.name == name), None)
+
+    def free_name(self, user_id: int, name: str) -> str:
+        names = {entry.name for entry in self.user_entries(user_id)}
+        candidate, number = name, 1
+        while candidate in names:
+            number += 1
+            candidate = f"{name}-{number}"
+        return candidate
+
+    def active(self, user_id: int) -> SessionEntry | None:
+        return self._entries.get(self._active.get(user_id))
+
+    def activate(self, entry: SessionEntry) -> None:
+        # background sessions keep feeding their terminals but stay quiet in the chat
+        for other in self.user_entries(entry.user_id):
+            other.session.muted = other is not entry
+        self._active[entry.user_id] = entry.session_id
+
+    def check(self, user_id: int) -> None:
+        user_count = len(self.user_entries(user_id))
+        total_count = len(self._entries)
+        if user_count >= self.max_per_user:
+            raise SessionLimitError(f"You already have {user_count} SSH sessions open, close one with /sessions.")
+        if total_count >= self.max_total:
+            raise SessionLimitError(f"{total_count} SSH sessions are already open, try again later.")
+
+    def add(self, user_id: int, chat_id: int, name: str, session: SSHInteractiveSession) -> SessionEntry:
+        entry = SessionEntry(next(self._ids), user_id, chat_id, name, session)
+        self._entries[entry.session_id] = entry
+        self.activate(entry)
+        # a shell that exits on its own (logout, dropped connection) leaves the registry with its reader
+        session.reader_task.add_done_callback(lambda _: self._discard(entry))
+        ssh_logger.info(f"Session #{entry.session_id} {name} to {session.name} registered for user {user_id}")
+        return entry
+
+    def _discard(self, entry: SessionEntry) -> SessionEntry | None:
+        if self._entries.pop(entry.session_id, None) is None:
+            return None
+        # no other session takes over, the owner's next message reconnects the one they were typing into
+        if self._active.get(entry.user_id) == entry.session_id:
+            del self._active[entry.user_id]
+        return entry
+
+    async def remove(self, entry: SessionEntry) -> None:
+        self._discard(entry)
+        if entry.session.reader_task:
+            entry.session.reader_task.cancel()
+        await run_in_thread(entry.session.close)
+        ssh_logger.info(f"Session #{entry.session_id} to {entry.session.name} of user {entry.user_id} closed")
+
+    async def reap(self) -> list[SessionEntry]:
+        expired = [entry for entry in self._entries.values() if entry.idle_seconds > self.idle_seconds]
+        for entry in expired:
+            await self.remove(entry)
+        return expired
+
+    async def close(self) -> None:
+        await asyncio.gather(*(self.remove(entry) for entry in self.entries()))
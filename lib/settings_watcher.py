@@ -0,0 +1,79 @@
+import os
+from dataclasses import dataclass, field
+from lib.config_reader import Settings, config, apply_settings, RESTART_FIELDS
+from lib.init import settings_file_path, keys_folder_path
+from lib.logger import main_logger
+from lib.otp_manager import otp_manager
+from lib.ssh_manager import ssh_manager
+from lib.temporal_storage import temporal_storage
+from lib.utils.general_utils import run_in_thread
+
+
+@dataclass
+class SettingsReload:
+    changed: list[str] = field(default_factory=list)
+    added: list[str] = field(default_factory=list)
+    rebuilt: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+
+    @property
+    def hosts_changed(self) -> bool:
+        return bool(self.added or self.rebuilt or self.removed)
+
+    def summary(self) -> str:
+        lines = [f"Settings reloaded, changed: {', '.join(self.changed) or 'nothing'}."]
+        for title, names in (("Added", self.added), ("Rebuilt", self.rebuilt), ("Removed", self.removed)):
+            if names:
+                lines.append(f"{title} hosts: {', '.join(names)}")
+        if restart := [name for name in self.changed if name in RESTART_FIELDS]:
+            lines.append(f"Restart the bot to apply: {', '.join(restart)}")
+        return '\n'.join(lines)
+
+
+class SettingsWatcher:
+    # polls settings.json and the ssh keys, a new version is only applied once it validates
+    def __init__(self):
+        self._stamp = self.stamp()
+
+    @staticmethod
+    def stamp() -> list[tuple[str, int, int]]:
+        stamp = []
+        for path in [settings_file_path, *sorted(keys_folder_path.glob('*'))]:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            stamp.append((str(path), stat.st_mtime_ns, stat.st_size))
+        return stamp
+
+    async def check(self) -> SettingsReload | None:
+        stamp = self.stamp()
+        if stamp == self._stamp:
+            return None
+        self._stamp = stamp
+        try:
+            return await self.reload()
+        except ValueError as e:
+            # a half written or broken file is ignored until the next change
+            main_logger.error(f"Settings were not reloaded, {settings_file_path} is invalid: {e}")
+            return None
+
+    async def reload(self) -> SettingsReload:
+        settings = await run_in_thread(Settings)
+        if settings.main_host not in [host.name for host in settings.hosts]:
+            raise ValueError(f"main host {settings.main_host.get_secret_value()} is not one of the hosts")
+        result = SettingsReload(apply_settings(settings))
+        result.added, result.rebuilt, result.removed = await ssh_manager.reconcile(config.hosts)
+        ssh_manager.update_session_limits()
+        if 'admin_ids' in result.changed:
+            # the router filters already shut former admins out, their open shells go as well
+            await ssh_manager.close_sessions_except(config.admin_ids)
+        temporal_storage.forget_hosts(result.removed)
+        if 'otp_secret' in result.changed:
+            otp_manager.set_secret(config.otp_secret)
+        if result.hosts_changed and 'hosts' not in result.changed:
+            result.changed.append('ssh keys')
+        return result
+
+
+settings_watcher = SettingsWatcher()
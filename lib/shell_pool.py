@@ -0,0 +1,95 @@
+import asyncio
+import time
+from collections import deque
+from io import BytesIO
+from typing import Callable, Awaitable
+from lib.host_executor import HostExecutor
+from lib.logger import ssh_logger
+from lib.models import HostModel, TerminalType
+from lib.ssh_interactive_session import SSHInteractiveSession
+from lib.utils.general_utils import run_in_thread
+
+
+class ShellPool:
+    # spare shells that are already connected, authenticated and sitting at a prompt
+    def __init__(self, host: HostModel, executor: HostExecutor):
+        self.host = host
+        self.name = host.name.get_secret_value()
+        self.size = host.shell_pool_size
+        self.idle_seconds = host.shell_pool_idle_seconds
+        self.executor = executor
+        self._idle: deque[tuple[SSHInteractiveSession, float]] = deque()
+        self._opening = 0
+        self._fill_task: asyncio.Task | None = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._idle)
+
+    async def _open(self) -> SSHInteractiveSession:
+        session = SSHInteractiveSession(self.host)
+        await self.executor.run(session.open)
+        return session
+
+    async def _fill(self) -> None:
+        while len(self._idle) + self._opening < self.size:
+            self._opening += 1
+            try:
+                session = await self._open()
+            except Exception as e:
+                ssh_logger.warning(f"Could not open a spare shell for {self.name}: {e}")
+                return
+            finally:
+                self._opening -= 1
+            self._idle.append((session, time.monotonic()))
+
+    def fill(self) -> None:
+        if self.size <= 0 or (self._fill_task and not self._fill_task.done()):
+            return
+        self._fill_task = asyncio.create_task(self._fill())
+
+    def take(self) -> SSHInteractiveSession | None:
+        while self._idle:
+            session, _ = self._idle.popleft()
+            if session.alive:
+                self.hits += 1
+                self.fill()
+                return session
+            session.close()
+
+        self.misses += 1
+        self.fill()
+        return None
+
+    async def acquire(self, terminal_type: TerminalType, width: int, height: int,
+                      callback: Callable[[str | BytesIO], Awaitable[None]]) -> SSHInteractiveSession:
+        session = self.take()
+        if session is None:
+            session = SSHInteractiveSession(self.host, terminal_type, width, height)
+            await self.executor.run(session.open)
+        else:
+            await self.executor.run(session.resize, terminal_type, width, height)
+        session.start(callback)
+        return session
+
+    async def reap(self) -> None:
+        # the pool shrinks back to nothing on hosts nobody uses, the next /activate warms it again
+        now = time.monotonic()
+        expired = [session for session, idle_since in self._idle
+                   if now - idle_since > self.idle_seconds or not session.alive]
+        self._idle = deque((session, idle_since) for session, idle_since in self._idle if session not in expired)
+        for session in expired:
+            await run_in_thread(session.close)
+
+    async def close(self) -> None:
+        if self._fill_task:
+            self._fill_task.cancel()
+        while self._idle:
+            session, _ = self._idle.popleft()
+            await run_in_thread(session.close)
+
+    def stats(self) -> str:
+        return f"{self.name}: {len(self._idle)}/{self.size} idle, {self._opening} opening, " \
+               f"{self.hits} hits, {self.misses} misses"
+
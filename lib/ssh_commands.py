@@ -1,66 +1,142 @@
 import asyncio
 import json
 import paramiko
+import socket
+import threading
 import time
+from dataclasses import dataclass
 from typing import Tuple, List, Callable, Awaitable
+from lib.api.docker_engine_api import DockerEngineClient, DockerStatsStreamer, ContainerStats
 from lib.config_reader import config
+from lib.host_executor import HostExecutor
+from lib.host_health import HostHealth
 from lib.init import keys_folder_path
 from lib.logger import ssh_logger
+from lib.metrics import ssh_connect_seconds, ssh_exec_seconds, ssh_probe_seconds
 from lib.models import HostModel
+from lib.tracing import tracer
+from lib.proc_metrics import ProcMetricsProbe, HostMetrics, PROC_METRICS_COMMAND
 # TODO: asyncssh
 
+UPDATE_FINISHED_MARKER = "Update finished with exit code"
+CONNECTION_ERRORS = (paramiko.SSHException, socket.timeout, EOFError, OSError)
+
+
+@dataclass
+class ComposeResult:
+    exit_status: int
+    output: str
+    containers: list[dict]
+
+
+def load_key(host: HostModel) -> paramiko.PKey:
+    return paramiko.Ed25519Key.from_private_key_file(keys_folder_path / host.key_name.get_secret_value())
+
+
 class SSHCommands:
     def __init__(self, host: HostModel):
         self.name = host.name.get_secret_value()
         self.hostname = host.hostname.get_secret_value()
         self.port = int(host.port.get_secret_value())
         self.username = host.username.get_secret_value()
-        self.key = paramiko.Ed25519Key.from_private_key_file(keys_folder_path / host.key_name.get_secret_value())
+        self.key = load_key(host)
         self.proj = host.docker_projects_path
         self.ssh: paramiko.SSHClient | None = None
         self.following_file: str = ''
+        self.proc_probe = ProcMetricsProbe()
+        self.docker = DockerEngineClient(self.connect, self.name)
+        self.docker_stats = DockerStatsStreamer(self.docker, host.docker_stats_streams)
+        self._connect_lock = threading.Lock()
+        # every blocking call for this host runs here, so a hung host cannot starve the others
+        self.executor = HostExecutor(self.name, host.executor_workers, host.executor_queue_size)
+        self.health = HostHealth(self.name, host.health_failure_threshold, host.health_reset_seconds)
         ssh_logger.info(f"SSH commands module for {self.name} created!")
 
-    def get_running_containers(self) -> dict:
-        result = self.run_single_command("docker ps -s --format json")
-        return json.loads(f'[{','.join(result[0].splitlines())}]')
-
-    def get_stats(self) -> tuple[dict, dict, str, str, str]:
-        results = self.run_multiple_commands([
-            "docker ps -s --format json",
-            "docker stats --no-stream --format json",
-            "free -h | awk '/Mem:/ {printf \"%s/%s\n\", $3, $2}'",
-            "top -bn1 | grep \"Cpu(s)\" | awk '{print 100 - $8 \"%\"}'",
-            "uptime -p"
-        ])
-        docker_ps = json.loads(f'[{','.join(results[0][0].splitlines())}]')
-        docker_stats = json.loads(f'[{','.join(results[1][0].splitlines())}]')
-        return docker_ps, docker_stats, results[2][0], results[3][0], results[4][0]
+    def get_running_containers(self) -> list[dict]:
+        return self.docker.containers()
+
+    def get_host_metrics(self) -> HostMetrics:
+        result, error = self.run_single_command(PROC_METRICS_COMMAND)
+        return self.proc_probe.parse(result)
+
+    def get_container_stats(self, containers: list[dict]) -> dict[str, ContainerStats]:
+        return self.docker_stats.get_stats(containers)
+
+    def get_stats(self) -> tuple[list[dict], dict[str, ContainerStats], HostMetrics]:
+        containers = self.docker.containers()
+        return containers, self.get_container_stats(containers), self.get_host_metrics()
+
+    def get_metrics(self) -> dict:
+        host_metrics = self.get_host_metrics()
+        container_stats = self.get_container_stats(self.docker.containers())
+
+        return {
+            "cpu": host_metrics.cpu_percent,
+            "ram": host_metrics.mem_percent,
+            "containers": {
+                name: {"cpu": stats.cpu_percent, "mem": stats.mem_usage} for name, stats in container_stats.items()
+            }
+        }
+
+    def get_running_digests(self) -> dict[str, set[str]]:
+        repo_digests = {image["Id"]: image.get("RepoDigests") or [] for image in self.docker.images()}
+
+        digests: dict[str, set[str]] = {}
+        for c in self.docker.containers(filters={"label": ["com.docker.compose.project"]}):
+            project = c["Labels"]["com.docker.compose.project"]
+            digests.setdefault(project, set()).update(
+                repo_digest.split('@', 1)[1] for repo_digest in repo_digests.get(c["ImageID"], [])
+            )
+        return digests
 
     def get_docker_projects(self) -> List[str]:
         result, error = self.run_single_command(f"ls {self.proj}")
         return result.splitlines()
 
-    def up_project(self, project_name: str) -> str:
-        result, error = self.run_single_command(f"cd {self.proj}/{project_name} && docker compose up -d")
-        return error
+    def up_project(self, project_name: str) -> ComposeResult:
+        return self._compose(project_name, "up -d")
 
-    def down_project(self, project_name: str) -> str:
-        result, error = self.run_single_command(f"cd {self.proj}/{project_name} && docker compose down")
-        return error
+    def down_project(self, project_name: str) -> ComposeResult:
+        return self._compose(project_name, "down")
+
+    def _compose(self, project_name: str, action: str) -> ComposeResult:
+        command = f"cd {self.proj}/{project_name} && docker compose {action}"
+        ssh_logger.info(f"Running command on {self.name}: {command}")
+        exit_status, result, error = self._exec(command)
+        # compose reports progress on stderr, so keep both streams
+        output = '\n'.join(filter(None, [result, error]))
+        return ComposeResult(exit_status, output, self.docker.project_containers(project_name))
 
     def update(self, project_name: str) -> str:
-        bot_update_log_file = "/tmp/bot_update.log"
+        bot_update_log_file = f"/tmp/bot_update_{project_name}.log"
         self.run_single_command(f"""
+: >{bot_update_log_file}
 nohup sh -c '
     cd {self.proj}/{project_name} &&
     docker compose pull &&
     docker compose down &&
     docker compose up -d
+    echo "{UPDATE_FINISHED_MARKER} $?"
 ' >{bot_update_log_file} 2>&1 &
 """)
         return bot_update_log_file
 
+    def wait_update(self, log_file: str, on_line: Callable[[str], None], timeout: float = 1800) -> int:
+        stdin, stdout, stderr = self.connect().exec_command(f"tail -n +1 -F {log_file}", timeout=timeout)
+        stdin.close()
+
+        try:
+            for line in stdout:
+                line = line.strip()
+                if line.startswith(UPDATE_FINISHED_MARKER):
+                    return int(line.removeprefix(UPDATE_FINISHED_MARKER))
+                if line:
+                    on_line(line)
+        finally:
+            stdout.channel.close()
+
+        raise RuntimeError(f"Update log {log_file} on {self.name} ended unexpectedly")
+
     # youruser ALL=(ALL) NOPASSWD: /usr/sbin/reboot
     def reboot(self):
         result, error = self.run_single_command(f"""
@@ -84,10 +160,12 @@ nohup sh -c '
         if self.following_file:
             raise RuntimeError(f"You are following file '{self.following_file}' right now!")
 
-        self.connect()
-        stdin, stdout, stderr = self.ssh.exec_command(f"tail -n 1 -F {location}", get_pty=True, timeout=None)
-        stdin.close()
         self.following_file = location
+        try:
+            stdin, stdout, stderr = await self.executor.run(self._open_follow, location)
+        except Exception:
+            self.following_file = ''
+            raise
 
         try:
             while True:
@@ -102,7 +180,11 @@ nohup sh -c '
             ssh_logger.error("Error in file following", exc_info=e)
         finally:
             stdout.channel.close()
-            self.disconnect()
+
+    def _open_follow(self, location: str):
+        stdin, stdout, stderr = self.connect().exec_command(f"tail -n 1 -F {location}", get_pty=True, timeout=None)
+        stdin.close()
+        return stdin, stdout, stderr
 
     def unfollow(self):
         self.following_file = ''
@@ -110,43 +192,98 @@ nohup sh -c '
     def openconnect(self, action: str):
         return self.run_single_command(f"sudo systemctl {action} openconnect.service")
 
-    def connect(self) -> None:
-        if self.ssh is None:
-            self.ssh = paramiko.SSHClient()
-            self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            self.ssh.connect(self.hostname, self.port, username=self.username, pkey=self.key)
+    def connect(self) -> paramiko.SSHClient:
+        # a host known to be down fails at once instead of holding a worker for the whole timeout
+        self.health.breaker.before_call()
+        try:
+            client = self._connect()
+        except CONNECTION_ERRORS:
+            self.health.breaker.record_failure()
+            raise
+        # a successful half open trial closes the breaker again
+        self.health.breaker.record_success()
+        return client
+
+    def _connect(self, timeout: float = 30) -> paramiko.SSHClient:
+        with self._connect_lock:
+            transport = self.ssh.get_transport() if self.ssh else None
+            if transport is None or not transport.is_active():
+                self.disconnect()
+                self.ssh = paramiko.SSHClient()
+                self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+                with (ssh_connect_seconds.time(host=self.name, kind='commands'),
+                      tracer.span('ssh.connect', host=self.name)):
+                    self.ssh.connect(self.hostname, self.port, username=self.username, pkey=self.key,
+                                     timeout=timeout)
+                self.ssh.get_transport().set_keepalive(30)
+                ssh_logger.info(f"SSH connection to {self.name} established!")
+            return self.ssh
+
+    def ping(self, timeout: float = 5) -> float:
+        # a no-op exec over the shared connection, so the probe measures what every command pays
+        start = time.perf_counter()
+        try:
+            with ssh_probe_seconds.time(host=self.name):
+                stdin, stdout, stderr = self._connect(timeout).exec_command('true', timeout=timeout)
+                if not stdout.channel.status_event.wait(timeout):
+                    stdout.channel.close()
+                    raise socket.timeout(f"no reply from {self.name} in {timeout}s")
+        except CONNECTION_ERRORS as e:
+            # the connection is shared with every running command, a slow reply alone is no reason to drop it
+            transport = self.ssh.get_transport() if self.ssh else None
+            if transport is None or not transport.is_active():
+                self.disconnect()
+            self.health.record_error(e)
+            raise
+        rtt = time.perf_counter() - start
+        self.health.record_probe(rtt)
+        return rtt
 
     def disconnect(self) -> None:
         if self.ssh:
             self.ssh.close()
             self.ssh = None
 
-    def run_multiple_commands(self, commands: List[str], delay: float = 1) -> List[Tuple[str, str]]:
-        if self.following_file:
-            raise RuntimeError(f"You are following file '{self.following_file}' right now!")
+    def close(self) -> None:
+        self.docker_stats.stop()
+        self.executor.shutdown()
+        self.disconnect()
 
+    def _exec(self, command: str) -> Tuple[int, str, str]:
+        client = self.connect()
+        with ssh_exec_seconds.time(host=self.name), tracer.span('ssh.exec', host=self.name, command=command[:200]):
+            try:
+                stdin, stdout, stderr = client.exec_command(command)
+
+                # Add timeout to prevent hanging
+                stdout.channel.settimeout(30)
+
+                result = stdout.read().decode().strip()
+                error = stderr.read().decode().strip()
+                exit_status = stdout.channel.recv_exit_status()
+            except CONNECTION_ERRORS:
+                self.health.breaker.record_failure()
+                raise
+        # scattered failures between successful commands never add up to the threshold
+        self.health.breaker.record_success()
+        return exit_status, result, error
+
+    def run_multiple_commands(self, commands: List[str], delay: float = 1) -> List[Tuple[str, str]]:
         if not commands:
             return []
 
         results = []
-        with self:
-            for i, command in enumerate(commands):
-                ssh_logger.info(f"Running command on {self.name}: {command}")
-                try:
-                    stdin, stdout, stderr = self.ssh.exec_command(command)
+        for i, command in enumerate(commands):
+            ssh_logger.info(f"Running command on {self.name}: {command}")
+            try:
+                exit_status, result, error = self._exec(command)
+                results.append((result, error))
 
-                    # Add timeout to prevent hanging
-                    stdout.channel.settimeout(30)
+                if i < len(commands) - 1:
+                    time.sleep(delay)
 
-                    result = stdout.read().decode().strip()
-                    error = stderr.read().decode().strip()
-                    results.append((result, error))
-
-                    if i < len(commands) - 1:
-                        time.sleep(delay)
-
-                except Exception as e:
-                    results.append(('', f"Command failed on {self.name}: {str(e)}"))
+            except Exception as e:
+                results.append(('', f"Command failed on {self.name}: {str(e)}"))
 
         return results
 
@@ -158,10 +295,10 @@ nohup sh -c '
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.disconnect()
+        self.close()
 
     def __del__(self):
-        self.disconnect()
+        self.close()
         ssh_logger.info(f"SSH commands module for {self.name} destroyed!")
 
 
@@ -3,13 +3,17 @@ from io import BytesIO
 from typing import Awaitable
 
 import paramiko
+import re
 import time
 import asyncio
+import contextvars
 from lib.config_reader import config
 from lib.emulated_terminal import EmulatedTerminal
 from lib.init import keys_folder_path
 from lib.logger import ssh_logger
+from lib.metrics import ssh_connect_seconds
 from lib.models import HostModel, TerminalType
+from lib.utils.general_utils import run_in_thread
 
 SPECIAL_KEYS = {
     # Arrow keys
@@ -142,6 +146,13 @@ SPECIAL_KEYS = {
     'del': '\x7f',  # Delete
 }
 
+# the text left of the cursor once the shell is waiting for input, e.g. "user@host:~$ ", "[root@host ~]# " or "~ ❯ "
+PROMPT_PATTERN = re.compile(r'[$#>%❯»\]]\s*$')
+PROMPT_TIMEOUT = 5
+PROMPT_QUIET = 0.05
+# prompts the pattern does not know are taken as ready once the output pauses for this long
+PROMPT_SETTLE = 0.5
+
 
 async def async_print(*args, **kwargs):
     print(*args, **kwargs)
@@ -160,9 +171,15 @@ class SSHInteractiveSession:
         self.client: paramiko.SSHClient | None = None
         self.channel: paramiko.channel.Channel | None = None
         self.with_callback = async_print
+        self.reader_task: asyncio.Task | None = None
+        self.callback: Callable[[str | BytesIO], Awaitable[None]] = async_print
+        self.muted = False
+        self.last_activity = time.monotonic()
+        self._startup_output = b''
         self._connected = False
 
-    async def connect(self, callback: Callable[[str | BytesIO], Awaitable[None]]) -> None:
+    def open(self, prompt_timeout: float = PROMPT_TIMEOUT) -> None:
+        # blocking part of the connection, runs in a worker thread
         if self._connected:
             return
 
@@ -170,29 +187,77 @@ class SSHInteractiveSession:
         self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
 
         try:
-            self.client.connect(self.hostname, self.port, username=self.username, pkey=self.key)
+            with ssh_connect_seconds.time(host=self.name, kind='interactive'):
+                self.client.connect(self.hostname, self.port, username=self.username, pkey=self.key)
 
             self.channel = self.client.invoke_shell(
                 term="xterm-256color",  # "vt100", "xterm", "xterm-256color"
                 width=self.emulated_terminal.width,
                 height=self.emulated_terminal.height
             )
-
-            # Give remote time to send banner / MOTD / prompt
-            time.sleep(1)
-
+            self._wait_for_prompt(prompt_timeout)
             self._connected = True
-            asyncio.create_task(self._read_output(callback))
-            ssh_logger.info(f"Interactive SSH session for {self.name} established!")
         except Exception as e:
             ssh_logger.error(f"Connection failed: {e}", exc_info=True)
-            self.close()
+            self._close_channel()
             raise
 
+    def _wait_for_prompt(self, timeout: float) -> None:
+        # banner / MOTD / prompt arrive in bursts, the shell is ready once a prompt is followed by silence
+        deadline = time.monotonic() + timeout
+        last_data = time.monotonic()
+        while time.monotonic() < deadline:
+            if self.channel.recv_ready():
+                chunk = self.channel.recv(8192)
+                self._startup_output += chunk
+                self.emulated_terminal.feed(chunk)
+                last_data = time.monotonic()
+            elif self.channel.exit_status_ready():
+                raise RuntimeError(f"Shell on {self.name} exited during startup")
+            elif self._startup_output and (time.monotonic() - last_data >= PROMPT_SETTLE or (
+                    PROMPT_PATTERN.search(self.emulated_terminal.cursor_line()) and
+                    time.monotonic() - last_data >= PROMPT_QUIET)):
+                return
+            else:
+                time.sleep(0.01)
+        ssh_logger.warning(f"No prompt from {self.name} after {timeout}s, starting the session anyway")
+
+    @property
+    def alive(self) -> bool:
+        return bool(self.channel and not self.channel.closed and self.client.get_transport() and
+                    self.client.get_transport().is_active())
+
+    def resize(self, terminal_type: TerminalType, width: int, height: int) -> None:
+        # pooled shells are opened before anyone knows the terminal they will be used with
+        self.terminal_type = terminal_type
+        if (width, height) == (self.emulated_terminal.width, self.emulated_terminal.height):
+            return
+        self.channel.resize_pty(width, height)
+        self.emulated_terminal = EmulatedTerminal(width, height)
+        self.emulated_terminal.feed(self._startup_output)
+
+    def start(self, callback: Callable[[str | BytesIO], Awaitable[None]]) -> None:
+        # the reader lives as long as the session, so it must not inherit the trace of /activate
+        self.last_activity = time.monotonic()
+        self.callback = callback
+        self.reader_task = asyncio.create_task(self._read_output(callback), context=contextvars.Context())
+        ssh_logger.info(f"Interactive SSH session for {self.name} established!")
+
+    async def connect(self, callback: Callable[[str | BytesIO], Awaitable[None]]) -> None:
+        if self._connected:
+            return
+
+        await run_in_thread(self.open)
+        self.start(callback)
+
     async def _read_output(self, callback: Callable[[str | BytesIO], Awaitable[None]], polling: float = 1) -> None:
         if not self.channel:
             return
 
+        # banner and prompt were already read while opening, nothing new would arrive to show them
+        if not self.muted:
+            await self._send_screen(callback)
+
         while True:
             if not self._connected:
                 break
@@ -203,17 +268,29 @@ class SSHInteractiveSession:
                 if self.channel.recv_stderr_ready():
                     self.emulated_terminal.feed(self.channel.recv_stderr(4096))
 
-                if self.terminal_type == TerminalType.text:
-                    await callback(self.emulated_terminal.text())
-                else:
-                    await callback(self.emulated_terminal.render())
+                if not self.muted:
+                    await self._send_screen(callback)
+            elif self.channel.closed or self.channel.exit_status_ready():
+                ssh_logger.info(f"Shell on {self.name} exited")
+                self.close()
+                break
 
             await asyncio.sleep(polling)
 
+    async def _send_screen(self, callback: Callable[[str | BytesIO], Awaitable[None]]) -> None:
+        if self.terminal_type == TerminalType.text:
+            await callback(self.emulated_terminal.text())
+        else:
+            await callback(self.emulated_terminal.render())
+
+    async def refresh(self) -> None:
+        await self._send_screen(self.callback)
+
     def send_command(self, command: str) -> None:
         if not self.channel or self.channel.closed:
             raise RuntimeError("No active shell channel")
 
+        self.last_activity = time.monotonic()
         lower = command.lower()
         if lower in SPECIAL_KEYS:
             self.channel.send(SPECIAL_KEYS[lower])
@@ -222,15 +299,17 @@ class SSHInteractiveSession:
             self.channel.send(command.encode("utf-8"))
         ssh_logger.info(f"Sent command to {self.name}: {command}")
 
-    def close(self) -> None:
-        if not self._connected:
-            return
-
+    def _close_channel(self) -> None:
         if self.channel and not self.channel.closed:
             self.channel.close()
         if self.client:
             self.client.close()
 
+    def close(self) -> None:
+        if not self._connected:
+            return
+
+        self._close_channel()
         self._connected = False
         ssh_logger.info(f"Interactive SSH session for {self.name} closed!")
 
@@ -1,14 +1,104 @@
-from typing import List
+import asyncio
+import time
+from io import BytesIO
+from typing import List, Callable, Awaitable
+from lib.api.rcon_client import RconClient
 from lib.config_reader import config
+from lib.host_executor import HostBusyError
+from lib.host_health import HealthReport
+from lib.logger import ssh_logger
 from lib.models import HostModel, TerminalType
-from lib.ssh_commands import SSHCommands
+from lib.ssh_commands import SSHCommands, load_key
+from lib.session_registry import SessionRegistry, SessionEntry, SessionLimitError
+from lib.shell_pool import ShellPool
 from lib.ssh_interactive_session import SSHInteractiveSession
+from lib.utils.general_utils import run_in_thread
+
+# a rollout on a rebuilt host can take half an hour, its old connection is not kept around that long
+DRAIN_TIMEOUT_SECONDS = 60
 
 
 class SSHManager:
     def __init__(self, hosts: List[HostModel]):
         self._hosts = {host.name.get_secret_value(): host for host in hosts}
         self._commands = {host.name.get_secret_value(): SSHCommands(host) for host in hosts}
+        self._shell_pools = {
+            name: ShellPool(host, self._commands[name].executor) for name, host in self._hosts.items()
+        }
+        self.sessions = SessionRegistry(config.session_max_per_user, config.session_max_total,
+                                        config.session_idle_seconds)
+        self._rcon_clients: dict[str, RconClient] = dict()
+        self._retiring: set[asyncio.Task] = set()
+
+    def update_session_limits(self) -> None:
+        self.sessions.max_per_user = config.session_max_per_user
+        self.sessions.max_total = config.session_max_total
+        self.sessions.idle_seconds = config.session_idle_seconds
+
+    def _host_changed(self, name: str, host: HostModel) -> bool:
+        if self._hosts[name] != host:
+            return True
+        # a key rotated under the same file name leaves the settings untouched
+        try:
+            return load_key(host) != self._commands[name].key
+        except Exception as e:
+            ssh_logger.warning(f"Could not load the key of {name}, keeping the old one: {e}")
+            return False
+
+    async def _retire(self, name: str, commands: SSHCommands, pool: ShellPool, client: RconClient | None) -> None:
+        for entry in self.sessions.entries():
+            if entry.session.name == name:
+                await self.sessions.remove(entry)
+        await pool.close()
+        if client:
+            await client.close()
+        # calls already queued on the old connection get a while to finish before it is closed
+        commands.executor.shutdown(cancel=False)
+        deadline = time.monotonic() + DRAIN_TIMEOUT_SECONDS
+        while not commands.executor.idle() and time.monotonic() < deadline:
+            await asyncio.sleep(1)
+        await run_in_thread(commands.close)
+        ssh_logger.info(f"Old setup of {name} closed")
+
+    def _build(self, host: HostModel) -> tuple[SSHCommands, ShellPool] | None:
+        try:
+            commands = SSHCommands(host)
+        except Exception as e:
+            ssh_logger.error(f"Could not set up host {host.name.get_secret_value()}: {e}")
+            return None
+        return commands, ShellPool(host, commands.executor)
+
+    async def reconcile(self, hosts: List[HostModel]) -> tuple[list[str], list[str], list[str]]:
+        # connections, spare shells and sessions of unchanged hosts are left alone
+        new_hosts = {host.name.get_secret_value(): host for host in hosts}
+        added = [name for name in new_hosts if name not in self._hosts]
+        removed = [name for name in self._hosts if name not in new_hosts]
+        changed = [name for name, host in new_hosts.items()
+                   if name in self._hosts and self._host_changed(name, host)]
+
+        retired = []
+        for name in added + changed:
+            if (built := self._build(new_hosts[name])) is None:
+                # a broken host keeps its old setup until the settings are fixed
+                (added if name in added else changed).remove(name)
+                continue
+            if name in changed:
+                retired.append((name, self._commands[name], self._shell_pools[name],
+                                self._rcon_clients.pop(name, None)))
+            self._hosts[name] = new_hosts[name]
+            self._commands[name], self._shell_pools[name] = built
+            self._shell_pools[name].fill()
+        for name in removed:
+            del self._hosts[name]
+            retired.append((name, self._commands.pop(name), self._shell_pools.pop(name),
+                            self._rcon_clients.pop(name, None)))
+
+        # the new setup is already in place, so the old one winds down without holding up the caller
+        for item in retired:
+            task = asyncio.create_task(self._retire(*item))
+            self._retiring.add(task)
+            task.add_done_callback(self._retiring.discard)
+        return added, changed, removed
 
     def __getitem__(self, name: str) -> SSHCommands:
         if name not in self._commands:
@@ -20,14 +110,102 @@ class SSHManager:
             raise KeyError(name)
         return self._hosts[name]
 
-    def interactive_session(self, name: str, terminal_type: TerminalType) -> SSHInteractiveSession:
+    async def interactive_session(self, name: str, terminal_type: TerminalType,
+                                  callback: Callable[[str | BytesIO], Awaitable[None]]) -> SSHInteractiveSession:
         if name not in self._hosts:
             raise KeyError(name)
         if terminal_type == TerminalType.text:
             width, height = 40, 24
         else:
             width, height = 120, 40
-        return SSHInteractiveSession(self._hosts[name], terminal_type, width, height)
+        return await self._shell_pools[name].acquire(terminal_type, width, height, callback)
+
+    def warm_shell_pools(self) -> None:
+        for pool in self._shell_pools.values():
+            pool.fill()
+
+    async def reap_shell_pools(self) -> None:
+        for pool in self._shell_pools.values():
+            await pool.reap()
+
+    async def close_shell_pools(self) -> None:
+        for pool in self._shell_pools.values():
+            await pool.close()
+
+    def shell_pool_stats(self) -> list[str]:
+        return [pool.stats() for pool in self._shell_pools.values()]
+
+    def get_rcon(self, name: str) -> RconClient | None:
+        rcon_settings = self.get_host(name).rcon
+        if rcon_settings is None:
+            return None
+        if name not in self._rcon_clients:
+            self._rcon_clients[name] = RconClient(
+                rcon_settings.address, int(rcon_settings.port), rcon_settings.password
+            )
+        return self._rcon_clients[name]
+
+    async def close_rcon_clients(self) -> None:
+        for client in self._rcon_clients.values():
+            await client.close()
+
+    async def open_session(self, user_id: int, chat_id: int, session_name: str, name: str,
+                           terminal_type: TerminalType,
+                           callback: Callable[[str | BytesIO], Awaitable[None]]) -> SessionEntry:
+        self.sessions.check(user_id)
+        session = await self.interactive_session(name, terminal_type, callback)
+        try:
+            # other sessions may have been opened while this one was connecting
+            self.sessions.check(user_id)
+        except SessionLimitError:
+            session.reader_task.cancel()
+            await run_in_thread(session.close)
+            raise
+        return self.sessions.add(user_id, chat_id, session_name, session)
+
+    async def switch_session(self, entry: SessionEntry) -> None:
+        # the shell never left, so switching is only a matter of who gets the output
+        self.sessions.activate(entry)
+        await entry.session.refresh()
+
+    def get_session(self, user_id: int) -> SSHInteractiveSession | None:
+        entry = self.sessions.active(user_id)
+        return entry.session if entry else None
+
+    async def close_session(self, user_id: int) -> bool:
+        entry = self.sessions.active(user_id)
+        if entry is None:
+            return False
+        await self.sessions.remove(entry)
+        return True
+
+    async def close_sessions_except(self, user_ids: list[int]) -> None:
+        for entry in self.sessions.entries():
+            if entry.user_id not in user_ids:
+                await self.sessions.remove(entry)
+
+    async def reap_idle_sessions(self) -> None:
+        for entry in await self.sessions.reap():
+            ssh_logger.info(f"Session #{entry.session_id} of user {entry.user_id} closed after being idle")
+
+    async def check_health(self) -> None:
+        async def probe(commands: SSHCommands) -> None:
+            try:
+                await commands.executor.run(commands.ping)
+            except HostBusyError:
+                # a saturated host is still reachable, its commands say so better than a probe
+                pass
+            except Exception as e:
+                ssh_logger.warning(f"Health probe of {commands.name} failed: {e}")
+
+        await asyncio.gather(*(probe(commands) for commands in self._commands.values()))
+
+    def health_reports(self) -> list[HealthReport]:
+        return [commands.health.report() for commands in self._commands.values()]
+
+    def stop_idle_streams(self) -> None:
+        for commands in self._commands.values():
+            commands.docker_stats.stop_idle()
 
     def get_hosts(self):
         return list(self._hosts.keys())
@@ -1,9 +1,15 @@
+import asyncio
 import json
+import os
+import threading
 from dataclasses import dataclass, fields, field
 from pathlib import Path
 from typing import get_origin
 from datetime import datetime
 from lib.init import persistent_file_path
+from lib.logger import main_logger
+
+STORAGE_DEBOUNCE_SECONDS = 1.0
 
 
 @dataclass
@@ -12,6 +18,11 @@ class PersistentData:
     startup_docker_checks: bool = True
     docker_image_update_check_interval_seconds: int = 300
     docker_updates_hashes: dict[str, str] = field(default_factory=dict)
+    max_parallel_updates_per_host: int = 2
+    metrics_collect_interval_seconds: int = 60
+    metrics_history_size: int = 1440
+    metrics_persistence_enabled: bool = True
+    database_retention_days: int = 365
 
 
 class Storage(PersistentData):
@@ -20,8 +31,19 @@ class Storage(PersistentData):
         super().__init__()
 
         self.__field_types = {f.name: get_origin(f.type) for f in fields(PersistentData)}
-        self.__auto_save_enabled = True
+        self.__dirty = False
+        self.__version = 0
+        self.__written_version = 0
+        self.__last_content = ''
+        self.__write_lock = threading.Lock()
+        self.__save_handle: asyncio.TimerHandle | None = None
+        self.__write_future: asyncio.Future | None = None
+
+        self.__auto_save_enabled = False
         self._load()
+        self.__dirty = False
+        self.__last_content = self._serialize()
+        self.__auto_save_enabled = True
 
     def _load(self):
         if not Path(self.__filename).exists():
@@ -44,7 +66,7 @@ class Storage(PersistentData):
             else:
                 setattr(self, key, value)
 
-    def save(self):
+    def _serialize(self) -> str:
         data = {k: v for k, v in self.__dict__.items() if not k.startswith('_')}
 
         for key, value in list(data.items()):
@@ -53,8 +75,76 @@ class Storage(PersistentData):
             elif isinstance(value, datetime):
                 data[key] = value.isoformat()
 
-        with open(self.__filename, 'w') as f:
-            json.dump(data, f, indent=2, default=str)
+        return json.dumps(data, indent=2, default=str)
+
+    def _pending_write(self) -> tuple[str, int] | None:
+        if not self.__dirty:
+            return None
+        self.__dirty = False
+
+        content = self._serialize()
+        if content == self.__last_content:
+            return None
+
+        self.__last_content = content
+        self.__version += 1
+        return content, self.__version
+
+    def _write(self, content: str, version: int):
+        with self.__write_lock:
+            if version <= self.__written_version:
+                return
+
+            tmp_filename = f'{self.__filename}.tmp'
+            with open(tmp_filename, 'w') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_filename, self.__filename)
+            self.__written_version = version
+
+    def _cancel_scheduled_save(self):
+        if self.__save_handle is not None:
+            self.__save_handle.cancel()
+            self.__save_handle = None
+
+    def _schedule_save(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # no event loop (scripts, import time), nothing to coalesce with
+            self.save()
+            return
+
+        if self.__save_handle is None:
+            self.__save_handle = loop.call_later(STORAGE_DEBOUNCE_SECONDS, self._save_in_background)
+
+    def _save_in_background(self):
+        self.__save_handle = None
+        if pending := self._pending_write():
+            self.__write_future = asyncio.get_running_loop().run_in_executor(None, self._write, *pending)
+            self.__write_future.add_done_callback(self._on_write_done)
+
+    def _on_write_done(self, future: asyncio.Future):
+        if future.cancelled() or future.exception() is None:
+            return
+        main_logger.error(f"Could not save {self.__filename}", exc_info=future.exception())
+        # the next save or flush writes everything again
+        self.__last_content = ''
+        self.__dirty = True
+
+    def save(self):
+        self._cancel_scheduled_save()
+        if pending := self._pending_write():
+            self._write(*pending)
+
+    async def flush(self):
+        self._cancel_scheduled_save()
+        if self.__write_future is not None:
+            # a failed write was already logged and is retried below
+            await asyncio.wait([self.__write_future])
+        if pending := self._pending_write():
+            await asyncio.get_running_loop().run_in_executor(None, self._write, *pending)
 
     @property
     def filename(self):
@@ -63,8 +153,10 @@ class Storage(PersistentData):
     def __setattr__(self, name, value):
         super().__setattr__(name, value)
 
-        if not name.startswith('_') and hasattr(self, '_Storage__auto_save_enabled') and self.__auto_save_enabled:
-            self.save()
+        if not name.startswith('_') and hasattr(self, '_Storage__auto_save_enabled'):
+            self.__dirty = True
+            if self.__auto_save_enabled:
+                self._schedule_save()
 
     def batch_update(self):
         class BatchContext:
@@ -72,12 +164,12 @@ class Storage(PersistentData):
                 self.storage = batch_storage
 
             def __enter__(self):
-                self.storage.__auto_save_enabled = False
+                self.storage._Storage__auto_save_enabled = False
                 return self.storage
 
             def __exit__(self, *args):
-                self.storage.__auto_save_enabled = True
-                self.storage.save()
+                self.storage._Storage__auto_save_enabled = True
+                self.storage._schedule_save()
 
         return BatchContext(self)
 
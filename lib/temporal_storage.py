@@ -1,7 +1,9 @@
 from pydantic import field_validator
+from lib.database import database
 from lib.models import UserModel
 from lib.ssh_manager import ssh_manager
 from lib.config_reader import config
+from lib.utils.general_utils import run_in_thread
 
 
 class User(UserModel, validate_assignment=True):
@@ -16,12 +18,34 @@ class User(UserModel, validate_assignment=True):
 class TemporalStorage:
     def __init__(self):
         self._users: dict[int, User] = dict()
+        # read once, so a cache miss never blocks the event loop on sqlite
+        self._stored_hosts = database.user_hosts()
 
     def get_user(self, user_id: int) -> User:
         if user_id not in self._users:
-            self._users[user_id] = User(host=config.main_host.get_secret_value())
+            host = self._stored_hosts.get(user_id)
+            if host not in ssh_manager.get_hosts():
+                host = config.main_host.get_secret_value()
+            self._users[user_id] = User(host=host)
 
         return self._users[user_id]
 
+    def get_host(self, user_id: int) -> str | None:
+        user = self._users.get(user_id)
+        return user.host if user else None
+
+    def forget_hosts(self, hosts: list[str]) -> None:
+        # users on a removed host fall back to the main host the next time they are looked up
+        for user_id in [user_id for user_id, user in self._users.items() if user.host in hosts]:
+            del self._users[user_id]
+
+    async def set_host(self, user_id: int, host: str) -> User:
+        user = self.get_user(user_id)
+        user.host = host
+        self._stored_hosts[user_id] = host
+        # the database lock can be held by a flush or prune for a while, the loop must not wait for it
+        await run_in_thread(database.set_user_host, user_id, host)
+        return user
+
 
 temporal_storage = TemporalStorage()
@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+TRACE_BUFFER_SIZE = 200
+TRACE_MAX_SPANS = 256
+
+
+@dataclass
+class Span:
+    trace: 'Trace'
+    name: str
+    span_id: str
+    parent_id: str | None
+    started_at: float = field(default_factory=time.time)
+    start: float = field(default_factory=time.perf_counter)
+    duration: float | None = None
+    error: str | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "offset_ms": round((self.start - self.trace.root.start) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.root: Span | None = None
+        self.spans: list[Span] = []
+        self.finished = False
+        self.dropped = 0
+
+    def add(self, span: Span) -> None:
+        # spans of tasks that outlive the request are not part of it
+        if self.finished:
+            return
+        if len(self.spans) >= TRACE_MAX_SPANS:
+            self.dropped += 1
+            return
+        self.spans.append(span)
+
+    def names(self) -> set[str]:
+        return {span.name for span in self.spans}
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "started_at": self.root.started_at,
+            "duration_ms": round(self.root.duration * 1000, 3) if self.root.duration is not None else None,
+            "dropped_spans": self.dropped,
+            "spans": [span.to_dict() for span in sorted(self.spans, key=lambda s: s.start)],
+        }
+
+
+current_span: ContextVar[Span | None] = ContextVar('current_span', default=None)
+
+
+class Tracer:
+    def __init__(self, max_traces: int = TRACE_BUFFER_SIZE):
+        self._traces: deque[Trace] = deque(maxlen=max_traces)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _run(self, span: Span) -> Iterator[Span]:
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - span.start
+            current_span.reset(token)
+            span.trace.add(span)
+
+    @contextmanager
+    def trace(self, name: str, **attributes) -> Iterator[Span]:
+        trace = Trace(os.urandom(8).hex())
+        trace.root = Span(trace, name, os.urandom(4).hex(), None, attributes=attributes)
+        try:
+            with self._run(trace.root) as span:
+                yield span
+        finally:
+            trace.finished = True
+            with self._lock:
+                self._traces.append(trace)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span | None]:
+        parent = current_span.get()
+        # outside of a traced update (scheduler jobs, background threads) nothing is recorded
+        if parent is None or parent.trace.finished:
+            yield None
+            return
+
+        with self._run(Span(parent.trace, name, os.urandom(4).hex(), parent.span_id, attributes=attributes)) as span:
+            yield span
+
+    def current_trace_id(self) -> str | None:
+        span = current_span.get()
+        return span.trace.trace_id if span else None
+
+    def export(self, name_filter: str | None = None, limit: int = 20) -> list[dict]:
+        with self._lock:
+            traces = list(self._traces)
+
+        result = []
+        for trace in reversed(traces):
+            if name_filter and trace.trace_id != name_filter and \
+                    not any(name_filter in name for name in trace.names()):
+                continue
+            result.append(trace.to_dict())
+            if len(result) >= limit:
+                break
+        return result
+
+
+tracer = Tracer()
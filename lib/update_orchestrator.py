@@ -0,0 +1,89 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from lib.logger import ssh_logger
+from lib.models import DockerUpdateModel
+from lib.ssh_manager import ssh_manager
+from lib.storage import storage
+from lib.utils.general_utils import run_in_thread
+
+UPDATE_TIMEOUT_SECONDS = 30 * 60
+
+
+@dataclass
+class UpdateProgress:
+    target: DockerUpdateModel
+    started: float = field(default_factory=time.monotonic)
+    finished: float | None = None
+    exit_status: int | None = None
+    error: str = ''
+    skipped: bool = False
+    last_lines: deque[str] = field(default_factory=lambda: deque(maxlen=5))
+
+    @property
+    def succeeded(self) -> bool:
+        return self.exit_status == 0
+
+    @property
+    def duration(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    def summary(self) -> str:
+        if self.skipped:
+            return "skipped, an update of this project is already running"
+        if self.finished is None:
+            return f"in progress for {self.duration:.0f}s: {self.last_lines[-1] if self.last_lines else 'starting'}"
+        if self.succeeded:
+            return f"updated in {self.duration:.0f}s"
+        return f"failed after {self.duration:.0f}s: {self.error or (self.last_lines[-1] if self.last_lines else '')}"
+
+
+class UpdateOrchestrator:
+    def __init__(self):
+        self._host_semaphores: dict[str, asyncio.Semaphore] = dict()
+        self.in_progress: dict[str, UpdateProgress] = dict()
+
+    async def run(self, targets: list[DockerUpdateModel]) -> list[UpdateProgress]:
+        # a project watched for several images is updated once, and never while an earlier rollout still runs it
+        progresses = []
+        for target in {target.to_str(): target for target in targets}.values():
+            if target.to_str() in self.in_progress:
+                progresses.append(UpdateProgress(target, finished=time.monotonic(), skipped=True))
+            else:
+                self.in_progress[target.to_str()] = UpdateProgress(target)
+                progresses.append(self.in_progress[target.to_str()])
+        return list(await asyncio.gather(*(
+            self._update(progress) for progress in progresses if not progress.skipped
+        ))) + [progress for progress in progresses if progress.skipped]
+
+    def _semaphore(self, host: str) -> asyncio.Semaphore:
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(storage.max_parallel_updates_per_host)
+        return self._host_semaphores[host]
+
+    async def _update(self, progress: UpdateProgress) -> UpdateProgress:
+        target = progress.target
+        async with self._semaphore(target.host):
+            progress.started = time.monotonic()
+
+            def on_line(line: str):
+                progress.last_lines.append(line)
+                ssh_logger.info(f"Update {target}: {line}")
+
+            try:
+                ssh = ssh_manager[target.host]
+                log_file = await ssh.executor.run(ssh.update, target.project_name)
+                # tailing the log can take half an hour, it must not hold one of the host's bounded workers
+                progress.exit_status = await run_in_thread(ssh.wait_update, log_file, on_line, UPDATE_TIMEOUT_SECONDS)
+            except Exception as e:
+                ssh_logger.error(f"Update {target} failed: {e}")
+                progress.error = str(e)
+            finally:
+                progress.finished = time.monotonic()
+                self.in_progress.pop(target.to_str(), None)
+
+            return progress
+
+
+update_orchestrator = UpdateOrchestrator()
@@ -1,7 +1,12 @@
 import asyncio
+import contextvars
+import functools
+import re
 from io import BytesIO
 from typing import ParamSpec, TypeVar, Callable
 
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60, 'w': 7 * 24 * 60 * 60}
+
 
 def get_file_from_str(string: str, filename: str) -> BytesIO:
     file = BytesIO(str(string).encode("utf-8"))
@@ -9,10 +14,46 @@ def get_file_from_str(string: str, filename: str) -> BytesIO:
     return file
 
 
+def parse_duration(duration: str) -> int:
+    match = re.fullmatch(r'(\d+)([smhdw])', duration.strip().lower())
+    if not match:
+        raise ValueError(f"Invalid duration: {duration}")
+    return int(match.group(1)) * DURATION_UNITS[match.group(2)]
+
+
+def format_size(size: float) -> str:
+    for unit in ['B', 'KiB', 'MiB', 'GiB']:
+        if abs(size) < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}TiB"
+
+
+def format_duration(seconds: float) -> str:
+    days, seconds = divmod(int(seconds), DURATION_UNITS['d'])
+    hours, seconds = divmod(seconds, DURATION_UNITS['h'])
+    minutes = seconds // DURATION_UNITS['m']
+    if days:
+        return f"{days}d {hours}h {minutes}m"
+    if hours:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m"
+
+
+def is_duration(duration: str) -> bool:
+    try:
+        parse_duration(duration)
+    except ValueError:
+        return False
+    return True
+
+
 P = ParamSpec("P")
 R = TypeVar("R")
 
 
 async def run_in_thread(func: Callable[P, R], *args: P.args) -> R:
     loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, func, *args)
+    # executors do not propagate contextvars, the current trace span included
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(None, functools.partial(context.run, func, *args))
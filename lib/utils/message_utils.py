@@ -1,7 +1,10 @@
 import asyncio
-from typing import List, runtime_checkable, Protocol, Union, Iterable
+from io import BytesIO
+from typing import List, runtime_checkable, Protocol, Union, Iterable, Callable, Awaitable
 from aiogram import types
 from aiogram.filters import CommandObject
+from aiogram.types import BufferedInputFile
+from lib.models import TerminalType
 
 
 def get_args(command: CommandObject, min_args=-1, max_args=-1) -> List[str]:
@@ -63,3 +66,32 @@ async def large_respond(message: types.Message, printable: Union[str, Iterable[S
         await message.answer("I've get smth else than a str or Iterable.")
 
     return True
+
+
+def stdout_callback_image_generator(message: types.Message):
+    async def stdout_callback(chunk: BytesIO):
+        try:
+            input_file = BufferedInputFile(chunk.read(), filename="terminal.png")
+            await message.answer_photo(input_file)
+        except Exception as e:
+            await message.answer(str(e))
+
+    return stdout_callback
+
+
+def stdout_callback_text_generator(message: types.Message):
+    async def stdout_callback(chunk: str):
+        if not chunk:
+            return
+        try:
+            await message.answer(f'```bash\n{chunk}```', parse_mode='Markdown')
+        except Exception as e:
+            await message.answer(str(e))
+
+    return stdout_callback
+
+
+def stdout_callback_generator(message: types.Message, terminal_type: str) -> Callable[[str | BytesIO], Awaitable[None]]:
+    if terminal_type == TerminalType.text:
+        return stdout_callback_text_generator(message)
+    return stdout_callback_image_generator(message)
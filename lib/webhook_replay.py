@@ -0,0 +1,76 @@
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+import aiohttp
+from lib.config_reader import config
+
+
+def load_updates(path: Path) -> list[dict]:
+    text = path.read_text()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        # one update per line
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    # a saved getUpdates response works as well as a plain list of updates
+    if isinstance(data, dict):
+        return data["result"] if "result" in data else [data]
+    return data
+
+
+def text_update(update_id: int, user_id: int, chat_id: int, text: str) -> dict:
+    entities = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}] if text.startswith('/') else []
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id == user_id else "supergroup"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "replay", "username": "replay"},
+            "text": text,
+            "entities": entities,
+        }
+    }
+
+
+async def replay_updates(updates: list[dict], url: str, secret: str = '', concurrency: int = 1) -> list[int]:
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with aiohttp.ClientSession() as session:
+        async def post(update: dict) -> int:
+            async with semaphore, session.post(url, json=update, headers=headers) as response:
+                return response.status
+
+        return list(await asyncio.gather(*(post(update) for update in updates)))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Post recorded updates to the local webhook server")
+    parser.add_argument("file", nargs="?", type=Path, help="json list, json lines or a getUpdates response")
+    parser.add_argument("--text", action="append", default=[], help="send a text message from the first admin")
+    parser.add_argument("--url", default=f"http://127.0.0.1:{config.webhook_port}{config.webhook_path}")
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    updates = load_updates(args.file) if args.file else []
+    first_update_id = int(time.time())
+    updates += [
+        text_update(first_update_id + i, config.admin_ids[0], config.main_group_id, text)
+        for i, text in enumerate(args.text)
+    ]
+    if not updates:
+        parser.error("nothing to replay, pass a file or --text")
+
+    start = time.perf_counter()
+    statuses = await replay_updates(updates, args.url, config.webhook_secret.get_secret_value(), args.concurrency)
+    elapsed = time.perf_counter() - start
+    print(f"{len(statuses)} updates in {elapsed:.2f}s, statuses: "
+          f"{', '.join(f'{status}: {statuses.count(status)}' for status in sorted(set(statuses)))}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())